@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple
+from enum import IntEnum
+
+"""Bitboard implementation of the knight's Isolation game state. The board
+   uses the padded layout of isolation.Isolation: cell (x, y) is bit
+   x + y * (_WIDTH + 2) of an int, set while the cell is open, and the two
+   padding columns at the end of each row are never set, so knight moves
+   cannot wrap around the board edges. The knight moves from every cell are
+   precomputed as bit masks, so move generation and liberty counts are a
+   few integer operations per node. States are immutable namedtuples with
+   the same fields and methods as isolation.Isolation, so the players can
+   search over them without changes"""
+
+
+_WIDTH = 11
+_HEIGHT = 9
+_ROW = _WIDTH + 2
+_SIZE = _ROW * _HEIGHT - 2
+
+
+class Action(IntEnum):
+    """Knight moves as offsets between cell indices, equal to the values of
+       isolation.Action"""
+    NNE = _ROW * 2 + 1
+    ENE = _ROW + 2
+    ESE = -_ROW + 2
+    SSE = -_ROW * 2 + 1
+    SSW = -_ROW * 2 - 1
+    WSW = -_ROW - 2
+    WNW = _ROW - 2
+    NNW = _ROW * 2 - 1
+
+
+_STEPS = {Action.NNE: (1, 2), Action.ENE: (2, 1), Action.ESE: (2, -1),
+          Action.SSE: (1, -2), Action.SSW: (-1, -2), Action.WSW: (-2, -1),
+          Action.WNW: (-2, 1), Action.NNW: (-1, 2)}
+
+CELLS = tuple(x + y * _ROW for y in range(_HEIGHT) for x in range(_WIDTH))
+
+_BLANK_BOARD = sum(1 << cell for cell in CELLS)
+
+
+def _knight_moves(cell):
+    """(action, target cell, target bit) of each knight move from a cell
+       that stays on the board"""
+
+    x, y = cell % _ROW, cell // _ROW
+    moves = []
+
+    for action, (dx, dy) in _STEPS.items():
+        if 0 <= x + dx < _WIDTH and 0 <= y + dy < _HEIGHT:
+            moves.append((action, cell + action, 1 << (cell + action)))
+
+    return tuple(moves)
+
+
+# knight moves and their union as a bit mask, indexed by cell
+MOVES = [()] * _SIZE
+MASKS = [0] * _SIZE
+
+for _cell in CELLS:
+    MOVES[_cell] = _knight_moves(_cell)
+    MASKS[_cell] = sum(bit for _, _, bit in MOVES[_cell])
+
+del _cell
+
+
+try:
+    popcount = int.bit_count
+except AttributeError:
+    def popcount(mask):
+        """Number of set bits of a non-negative int"""
+        return bin(mask).count('1')
+
+
+def open_cells(mask):
+    """Indices of the set bits of a board mask, in increasing order"""
+
+    cells = []
+    while mask:
+        low = mask & -mask
+        cells.append(low.bit_length() - 1)
+        mask ^= low
+
+    return cells
+
+
+class Isolation(namedtuple('Isolation', ['board', 'ply_count', 'locs'])):
+    """
+    Immutable bitboard state of knight's Isolation
+
+    Parameters:
+    ----------
+    board : int
+        Bit mask of the open cells
+
+    ply_count : int
+        Number of moves played so far
+
+    locs : tuple
+        Cell of each player, None before the player's first move
+
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, board=_BLANK_BOARD, ply_count=0, locs=(None, None)):
+        return tuple.__new__(cls, (board, ply_count, locs))
+
+
+    @classmethod
+    def from_state(cls, state):
+        """Bitboard copy of an isolation.Isolation state"""
+
+        return cls(state.board, state.ply_count, tuple(state.locs))
+
+
+    def player(self):
+        """Index of the player to move"""
+
+        return self.ply_count % 2
+
+
+    def actions(self):
+        """Legal actions of the player to move. Any open cell on the
+           player's first move, and a knight move to an open cell after"""
+
+        loc = self.locs[self.ply_count % 2]
+        if loc is None:
+            return open_cells(self.board)
+
+        board = self.board
+        return [action for action, _, bit in MOVES[loc] if board & bit]
+
+
+    def result(self, action):
+        """State after the player to move takes an action"""
+
+        player = self.ply_count % 2
+        prev_loc = self.locs[player]
+        loc = action if prev_loc is None else prev_loc + action
+
+        bit = 1 << loc
+        if not self.board & bit:
+            raise Exception('Failed to apply action {} at loc {}'.format(
+                action, loc))
+
+        locs = (loc, self.locs[1]) if player == 0 else (self.locs[0], loc)
+
+        return tuple.__new__(Isolation,
+                             (self.board ^ bit, self.ply_count + 1, locs))
+
+
+    def liberty_mask(self, loc):
+        """Bit mask of the open cells a knight at loc can move to, or of all
+           open cells if loc is None"""
+
+        if loc is None:
+            return self.board
+
+        return self.board & MASKS[loc]
+
+
+    def liberties(self, loc):
+        """Open cells a knight at loc can move to, or all open cells if loc
+           is None"""
+
+        if loc is None:
+            return open_cells(self.board)
+
+        board = self.board
+        return [target for _, target, bit in MOVES[loc] if board & bit]
+
+
+    def liberty_count(self, loc):
+        """Number of liberties of loc without building the list"""
+
+        return popcount(self.liberty_mask(loc))
+
+
+    def _has_liberties(self, player_id):
+        """Whether the player has a liberty. Like isolation.Isolation, which
+           tests any() of the liberty cells, a move to cell 0 does not
+           count"""
+
+        return bool(self.liberty_mask(self.locs[player_id]) >> 1)
+
+
+    def terminal_test(self):
+        """Whether either player has no liberties, as in
+           isolation.Isolation"""
+
+        return not (self._has_liberties(0) and self._has_liberties(1))
+
+
+    def utility(self, player_id):
+        """+inf if player_id has won, -inf if it has lost, and 0 while the
+           game is not over. The player to move wins if only the opponent
+           has no liberties"""
+
+        if not self.terminal_test():
+            return 0
+
+        active_wins = (self._has_liberties(self.player())
+                       == (player_id == self.player()))
+
+        return float('inf') if active_wins else float('-inf')
+
+
+def to_action(state, action):
+    """
+    The action of a harness state equal to an action chosen on a bitboard
+    state, so the value put on the queue has the harness's own type
+
+    Parameters
+    ----------
+    state : isolation.Isolation
+        State the action was chosen for
+    action : Action or int
+        Knight move, or a cell on the player's first move
+
+    Returns
+    -------
+    Action or int
+    """
+
+    for legal in state.actions():
+        if legal == action:
+            return legal
+
+    return action
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from functools import lru_cache
+
+from GamePlaying.bitboard import MASKS, popcount, _HEIGHT, _ROW, _SIZE, _WIDTH
+
+"""Heuristic evaluation of Isolation states for the search. Cell coordinates
+   and centre distances are precomputed per cell, and a leaf's liberties are
+   computed once as bit masks and shared by every term of the heuristic.
+   The CustomPlayer methods of the same name delegate to these heuristics,
+   which work on any state with the padded board layout, bitboard or not"""
+
+
+CENTER = (_WIDTH // 2, _HEIGHT // 2)
+CENTER_CELL = CENTER[0] + CENTER[1] * _ROW
+
+# per cell lookup tables, indexed by cell index
+XY = [(cell % _ROW, cell // _ROW) for cell in range(_SIZE)]
+CENTER_DISTANCE = [abs(x - CENTER[0]) + abs(y - CENTER[1]) for x, y in XY]
+
+
+def baseline(state, player_id, own, opp):
+    return popcount(own) - popcount(opp)
+
+
+def offensive(state, player_id, own, opp):
+    return popcount(own) - popcount(opp) * 2
+
+
+def defensive(state, player_id, own, opp):
+    return popcount(own) * 2 - popcount(opp)
+
+
+def _ratio(state):
+    return state.ply_count / popcount(state.board)
+
+
+def defensive2offensive(state, player_id, own, opp):
+    if _ratio(state) <= 0.5:
+        return defensive(state, player_id, own, opp)
+    return offensive(state, player_id, own, opp)
+
+
+def offensive2defensive(state, player_id, own, opp):
+    if _ratio(state) <= 0.5:
+        return offensive(state, player_id, own, opp)
+    return defensive(state, player_id, own, opp)
+
+
+def _center_distance(loc):
+    # a player that has not moved yet can still take any cell, the center
+    # included, so it counts as being on it
+    return 0 if loc is None else CENTER_DISTANCE[loc]
+
+
+def favor_center(state, player_id, own, opp):
+    # scaled to a small value, as it is less important than mobility
+    own_distance = _center_distance(state.locs[player_id])
+    opp_distance = _center_distance(state.locs[1 - player_id])
+    return float(own_distance - opp_distance) / 10
+
+
+def block_opponent(state, player_id, own, opp):
+    # offensive, plus the opponent's moves the player can take first
+    return offensive(state, player_id, own, opp) + popcount(own & opp)
+
+
+def _or_favor_center(heuristic):
+    """Heuristic that falls back to favor_center when both players have
+       the same number of moves"""
+
+    def evaluate(state, player_id, own, opp):
+        if popcount(own) != popcount(opp):
+            return heuristic(state, player_id, own, opp)
+        return favor_center(state, player_id, own, opp)
+
+    return evaluate
+
+
+HEURISTICS = {'baseline': baseline,
+              'offensive': offensive,
+              'defensive': defensive,
+              'offensive2defensive': offensive2defensive,
+              'defensive2offensive': defensive2offensive,
+              'favor_center': favor_center,
+              'block_opponent': block_opponent,
+              'heuristic1': _or_favor_center(offensive2defensive),
+              'heuristic2': _or_favor_center(defensive2offensive),
+              'heuristic3': _or_favor_center(offensive),
+              'heuristic4': _or_favor_center(defensive)}
+
+
+@lru_cache(maxsize=None)
+def evaluator(name, player_id):
+    """
+    Resolve a heuristic once, for use at every leaf of a search. Evaluators
+    are cached, so resolving the same one again is a lookup
+
+    Parameters
+    ----------
+    name : str
+        Key of HEURISTICS
+    player_id : int
+        Player the score is computed for
+
+    Returns
+    -------
+    callable
+        Takes a state and returns its score
+    """
+
+    if name not in HEURISTICS:
+        raise Exception('Unknown heuristic {!r}. Choose from {}'.format(
+            name, ', '.join(HEURISTICS)))
+
+    heuristic = HEURISTICS[name]
+    opp_id = 1 - player_id
+
+    def evaluate(state):
+        board = state.board
+        own_loc = state.locs[player_id]
+        opp_loc = state.locs[opp_id]
+        own = board if own_loc is None else board & MASKS[own_loc]
+        opp = board if opp_loc is None else board & MASKS[opp_loc]
+        return heuristic(state, player_id, own, opp)
+
+    return evaluate
+
+
+def evaluate_batch(states, name, player_id):
+    """Scores of several states, resolving the heuristic once"""
+
+    evaluate = evaluator(name, player_id)
+
+    return [evaluate(state) for state in states]
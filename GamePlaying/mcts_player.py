@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import atexit
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from GamePlaying.bitboard import (Isolation, MASKS, open_cells, popcount,
+                                  to_action)
+from GamePlaying.sample_players import DataPlayer
+
+"""Monte Carlo Tree Search player for knight's Isolation. The tree is grown
+   with UCT selection and scored with fast playouts on raw bitboards. The
+   subtree of the chosen move is kept in the player's context and reused on
+   the next turn, and the search can run on several processes in parallel,
+   each growing its own tree from the root, with the root statistics merged
+   before the move is chosen"""
+
+
+# worker processes shared by all MCTS players of a process, created on
+# first use
+_POOL = None
+_POOL_SIZE = 0
+
+
+def _pool(n_workers):
+    global _POOL, _POOL_SIZE
+    if _POOL is None or _POOL_SIZE < n_workers:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False)
+        _POOL = ProcessPoolExecutor(n_workers)
+        _POOL_SIZE = n_workers
+    return _POOL
+
+
+def shutdown_pool():
+    """Shut down the worker processes, if any were started"""
+    global _POOL, _POOL_SIZE
+    if _POOL is not None:
+        _POOL.shutdown()
+        _POOL = None
+        _POOL_SIZE = 0
+
+
+atexit.register(shutdown_pool)
+
+
+def rollout(state, rng, epsilon=0.2):
+    """ Play a game out from state and return the index of the winner.
+
+    Each move goes to the open destination with the most onward moves, or
+    to a random one with probability epsilon. Moves are scored with a
+    popcount of the destination's knight mask, so no successor states or
+    liberty lists are built, unlike GreedyPlayer's
+    max(state.actions(), key=...)
+    """
+    board = state.board
+    ply = state.ply_count
+    locs = list(state.locs)
+
+    while True:
+        player = ply % 2
+        loc, other = locs[player], locs[1 - player]
+        moves = board if loc is None else board & MASKS[loc]
+        # as in isolation.Isolation, the game ends when either player has
+        # no liberties, and a lone move to cell 0 does not count
+        if not moves >> 1:
+            return 1 - player
+        if not (board if other is None else board & MASKS[other]) >> 1:
+            return player
+
+        targets = open_cells(moves)
+        if len(targets) == 1:
+            target = targets[0]
+        elif rng.random() < epsilon:
+            target = rng.choice(targets)
+        else:
+            target = max(targets, key=lambda t: popcount(board & MASKS[t]))
+
+        board ^= 1 << target
+        locs[player] = target
+        ply += 1
+
+
+class Node:
+    """ Node of the search tree
+
+    Attributes
+    ----------
+    state : bitboard.Isolation
+        Game state of the node
+
+    action : Action or int
+        Move leading to this node from its parent
+
+    visits, wins : int
+        Number of playouts through the node, and how many of them were won
+        by the player who made the move leading to it
+    """
+    __slots__ = ('state', 'parent', 'action', 'children', 'untried',
+                 'visits', 'wins')
+
+    def __init__(self, state, rng, parent=None, action=None):
+        self.state = state
+        self.parent = parent
+        self.action = action
+        self.children = []
+        self.untried = [] if state.terminal_test() else state.actions()
+        rng.shuffle(self.untried)
+        self.visits = 0
+        self.wins = 0
+
+    def select(self, c):
+        """Child with the highest upper confidence bound"""
+        log_n = math.log(self.visits)
+        return max(self.children,
+                   key=lambda n: n.wins / n.visits
+                   + c * math.sqrt(log_n / n.visits))
+
+    def expand(self, rng):
+        """Add the child of an untried move"""
+        action = self.untried.pop()
+        child = Node(self.state.result(action), rng, self, action)
+        self.children.append(child)
+        return child
+
+    def child(self, action, rng):
+        """Child of a move, expanded if needed"""
+        for child in self.children:
+            if child.action == action:
+                return child
+        self.untried.remove(action)
+        child = Node(self.state.result(action), rng, self, action)
+        self.children.append(child)
+        return child
+
+    def best(self):
+        """Most visited child"""
+        return max(self.children, key=lambda n: n.visits)
+
+
+def search(root, deadline, rng, c=math.sqrt(2), epsilon=0.2,
+           callback=None, report_every=256):
+    """ Run MCTS iterations from root until time.perf_counter() passes the
+    deadline. Calls callback with the root every report_every iterations.
+    Returns the number of iterations
+    """
+    clock = time.perf_counter
+    iterations = 0
+
+    while clock() < deadline:
+        node = root
+        while not node.untried and node.children:
+            node = node.select(c)
+        if node.untried:
+            node = node.expand(rng)
+
+        winner = rollout(node.state, rng, epsilon)
+
+        while node is not None:
+            node.visits += 1
+            # wins are counted for the player who moved into the node
+            if winner != node.state.ply_count % 2:
+                node.wins += 1
+            node = node.parent
+
+        iterations += 1
+        if callback is not None and iterations % report_every == 0:
+            callback(root)
+
+    return iterations
+
+
+def _search_root(state, stop, seed, c, epsilon):
+    """ Worker task of a root-parallel search: grow a new tree from state
+    until the wall clock time stop and return the visits and wins of each
+    root move. Wall clock time is comparable across processes, so a task
+    that starts late still stops on time
+    """
+    rng = random.Random(seed)
+    root = Node(state, rng)
+    search(root, time.perf_counter() + (stop - time.time()), rng, c, epsilon)
+    return {child.action: (child.visits, child.wins)
+            for child in root.children}
+
+
+class MCTSPlayer(DataPlayer):
+    """ Monte Carlo Tree Search player using UCT
+
+    The subtree below the chosen move is kept in self.context, and the next
+    turn resumes from the node of the opponent's reply, if it was expanded.
+    With n_jobs > 1, n_jobs - 1 worker processes also search the root for
+    the same time budget, and their root statistics are added to the tree
+    before the move is chosen
+
+    Parameters
+    ----------
+    player_id : int
+        Index of the player, 0 or 1
+
+    time_limit : float
+        Time the harness allows per move in milliseconds
+
+    time_margin : float
+        Milliseconds kept in reserve to choose and return the move
+
+    c : float
+        Exploration constant of UCT
+
+    epsilon : float
+        Probability of a random move in the playouts. See rollout()
+
+    n_jobs : int
+        Number of processes to search with, including this one
+
+    random_state : int, optional
+        Seed of the search
+    """
+    def __init__(self, player_id, time_limit=150, time_margin=30,
+                 c=math.sqrt(2), epsilon=0.2, n_jobs=1, random_state=None):
+        super().__init__(player_id)
+        self.time_limit = time_limit
+        self.time_margin = time_margin
+        self.c = c
+        self.epsilon = epsilon
+        self.n_jobs = n_jobs
+        self.rng = random.Random(random_state)
+        self.iterations = 0
+
+    def get_action(self, state):
+        """ Grow the search tree until the time budget runs out, putting
+        the most visited move on the queue as the search goes
+        """
+        start = time.perf_counter()
+        deadline = start + (self.time_limit - self.time_margin) / 1000.
+        harness_state = state
+        root = self.reuse(Isolation.from_state(state))
+
+        def publish(root):
+            self.queue.put(to_action(harness_state, root.best().action))
+
+        # any legal move, in case the search is cut off right away
+        self.queue.put(to_action(harness_state, root.state.actions()[0]))
+        if root.children:
+            publish(root)
+
+        futures = []
+        if self.n_jobs > 1:
+            pool = _pool(self.n_jobs - 1)
+            # leave time to send the results back
+            stop = time.time() + (deadline - time.perf_counter()) * 0.8
+            futures = [pool.submit(_search_root, root.state, stop,
+                                   self.rng.getrandbits(32), self.c,
+                                   self.epsilon)
+                       for _ in range(self.n_jobs - 1)]
+
+        self.iterations = search(root, deadline, self.rng, self.c,
+                                 self.epsilon, callback=publish)
+
+        if futures:
+            remaining = max(0., deadline - time.perf_counter())
+            done, late = wait(futures, timeout=remaining)
+            for future in done:
+                self.merge(root, future.result())
+            # tasks still queued, e.g. while the workers start up, must not
+            # run into the opponent's turn. Running tasks stop at stop
+            for future in late:
+                future.cancel()
+
+        best = root.best()
+        self.queue.put(to_action(harness_state, best.action))
+
+        # keep the subtree of the chosen move for the next turn
+        best.parent = None
+        self.context = best
+
+    def reuse(self, state):
+        """ Node of state in the subtree kept from the previous turn, or a
+        new root if the opponent's reply was not expanded
+        """
+        node = self.context
+        if isinstance(node, Node):
+            for child in node.children:
+                if child.state == state:
+                    child.parent = None
+                    return child
+        return Node(state, self.rng)
+
+    def merge(self, root, stats):
+        """Add the root move statistics of a worker to the tree"""
+        for action, (visits, wins) in stats.items():
+            child = root.child(action, self.rng)
+            child.visits += visits
+            child.wins += wins
+            root.visits += visits
@@ -9,11 +9,64 @@ Created on Tue Dec  8 13:56:52 2020
 
 
 import random
+import time
+from itertools import count
+from GamePlaying.bitboard import Isolation, MASKS, popcount, to_action
+from GamePlaying.evaluation import (CENTER, CENTER_CELL, HEURISTICS, XY,
+                                    evaluator)
 from GamePlaying.sample_players import DataPlayer
+from GamePlaying.transposition import (EXACT, LOWER, TranspositionTable,
+                                       bound, update_hash, zobrist_hash)
 
-_WIDTH = 11
-_HEIGHT = 9
-_SIZE = (_WIDTH + 2) * _HEIGHT - 2
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget of a move runs out"""
+    pass
+
+
+class MoveOrdering:
+    """ Orders the moves of a node for alpha-beta search: the best move
+    stored in the transposition table first, then the killer moves that
+    caused a cutoff at the same distance from the root, then moves by their
+    history score, the sum of depth ** 2 over the cutoffs each (cell, move)
+    pair caused. Remaining ties are broken by the number of liberties of
+    the destination cell, a cheap mobility presort
+
+    Parameters
+    ----------
+    n_killers : int
+        Killer moves kept per ply
+    """
+    def __init__(self, n_killers=2):
+        self.n_killers = n_killers
+        self.killers = {}
+        self.history = {}
+
+    def order(self, state, actions, hash_move, ply):
+        if len(actions) < 2:
+            return actions
+        loc = state.locs[state.ply_count % 2]
+        board = state.board
+        killers = self.killers.get(ply, ())
+        history = self.history
+
+        def rank(action):
+            target = action if loc is None else loc + action
+            return (action == hash_move, action in killers,
+                    history.get((loc, action), 0),
+                    popcount(board & MASKS[target]))
+
+        return sorted(actions, key=rank, reverse=True)
+
+    def update(self, state, action, ply, depth):
+        """Record a move that caused a cutoff"""
+        killers = self.killers.setdefault(ply, [])
+        if action not in killers:
+            killers.insert(0, action)
+            del killers[self.n_killers:]
+        loc = state.locs[state.ply_count % 2]
+        self.history[(loc, action)] = (self.history.get((loc, action), 0)
+                                       + depth * depth)
 
 
 class CustomPlayer(DataPlayer):
@@ -32,7 +85,60 @@ class CustomPlayer(DataPlayer):
     - You can pass state forward to your agent on the next turn by assigning
       any pickleable object to the self.context attribute.
     **********************************************************************
+
+    Parameters
+    ----------
+    player_id : int
+        Index of the player, 0 or 1
+
+    time_limit : float
+        Time the harness allows per move in milliseconds. The search is
+        deepened until time_limit - time_margin has passed
+
+    time_margin : float
+        Milliseconds kept in reserve to abort the search and return
+
+    score_func : str
+        Heuristic used at the search horizon. See score_fn
+
+    max_depth : int, optional
+        Deepest search to run, unlimited if None
+
+    tt_size : int
+        Number of slots of the transposition table. The table is kept in
+        self.context, so it is reused on the following turns. The harness
+        pickles the context between turns, which takes longer the larger
+        the table is
+
+    move_ordering : bool
+        Order moves with a MoveOrdering. Can be turned off to measure the
+        pruning gain in self.nodes
+
+    Attributes
+    ----------
+    nodes : int
+        Number of nodes visited by the searches of the last move
+
+    stats : list of dict
+        Depth, nodes visited and elapsed seconds of each completed search
+        of the last move
     """
+    _horizon = False
+    _score_fn = None
+
+    def __init__(self, player_id, time_limit=150, time_margin=30,
+                 score_func='defensive', max_depth=None, tt_size=1 << 14,
+                 move_ordering=True):
+        super().__init__(player_id)
+        self.time_limit = time_limit
+        self.time_margin = time_margin
+        self.score_func = score_func
+        self.max_depth = max_depth
+        self.tt_size = tt_size
+        self.move_ordering = move_ordering
+        self.nodes = 0
+        self.stats = []
+
     def get_action(self, state):
         """ Employ an adversarial search technique to choose an action
         available in the current state calls self.queue.put(ACTION) at least
@@ -50,40 +156,89 @@ class CustomPlayer(DataPlayer):
           Refer to (and use!) the Isolation.play() function to run games.
         **********************************************************************
         """
-        # TODO: Replace the example implementation below with your own search
-        #       method by combining techniques from lecture
-        #
-        # EXAMPLE: choose a random move without any search--this function MUST
-        #          call self.queue.put(ACTION) at least once before time expires
-        #          (the timer is automatically managed for you)
+        # search over a bitboard copy of the state, and answer with the
+        # harness's own action object
+        harness_state, state = state, Isolation.from_state(state)
         
-        if state.ply_count < 2:
-            #If game is just starting, take the center square if available, or next to it if not
-            #try:
-            #    self.queue.put(self.center2ind(state))
-            #except:
-            self.queue.put(random.choice([self.center2ind(state)+1, self.center2ind(state)-1]))
+        move = self.book_move(state)
+        if move is not None:
+            self.queue.put(to_action(harness_state, move))
+
+        elif state.ply_count < 2:
+            #If game is just starting, take an open square next to the center
+            moves = [cell for cell in (CENTER_CELL + 1, CENTER_CELL - 1)
+                     if state.board & (1 << cell)]
+            self.queue.put(random.choice(moves))
 
         else:
-            self.queue.put(self.alpha_beta(state, 
-                                           score_func='defensive', 
-                                           depth=2))
+            self.iterative_deepening(state, harness_state)
+
+    def book_move(self, state):
+        """ Move of the opening book loaded from data.pickle for this
+        position, or None if the position is not in the book. See
+        GamePlaying.opening_book
+        """
+        if not isinstance(self.data, dict):
+            return None
+        move = self.data.get(zobrist_hash(state))
+        if move is None or move not in state.actions():
+            return None
+        return move
+
+    def iterative_deepening(self, state, harness_state=None):
+        """ Run alpha-beta searches of increasing depth until the time budget
+        runs out, putting the best move of each completed depth on the queue.
+        A search that is cut off by the deadline is discarded, so the move on
+        the queue always comes from a complete search
+
+        Returns the depth of the last completed search
+        """
+        harness_state = harness_state or state
+        deadline = time.perf_counter() + (self.time_limit -
+                                          self.time_margin) / 1000.
+
+        # any legal move, in case not even depth 1 completes
+        self.queue.put(to_action(harness_state, state.actions()[0]))
+
+        # the transposition table of the previous turns, if any
+        table = self.context
+        if not isinstance(table, TranspositionTable):
+            table = TranspositionTable(self.tt_size)
+        table.new_search()
+        self.context = table
+
+        # killer moves and history scores carry over between depths
+        ordering = MoveOrdering() if self.move_ordering else None
+        self.nodes = 0
+        self.stats = []
+        start = time.perf_counter()
+
+        for depth in count(1):
+            if self.max_depth is not None and depth > self.max_depth:
+                return depth - 1
+            self._horizon = False
+            try:
+                move = self.alpha_beta(state, self.score_func, depth,
+                                       deadline=deadline, table=table,
+                                       ordering=ordering)
+            except SearchTimeout:
+                return depth - 1
+            self.queue.put(to_action(harness_state, move))
+            self.stats.append({'depth': depth, 'nodes': self.nodes,
+                               'elapsed': time.perf_counter() - start})
+
+            # no node was cut off at the horizon, so the whole game tree
+            # was searched and deeper searches cannot change the result
+            if not self._horizon:
+                return depth
         
     @property
     def score_fn(self):
-        # store heuristic functions as callables in dictionary
+        # store heuristic functions as callables in dictionary, built once
         # can vary scoring mechanism in self.alpha_beta()
-        return {'baseline': self.baseline,
-                'offensive': self.offensive,
-                'defensive': self.defensive,
-                'offensive2defensive': self.offensive2defensive,
-                'defensive2offensive': self.defensive2offensive,
-                'favor_center': self.favor_center,
-                'block_opponent': self.block_opponent,
-                'heuristic1': self.heuristic1,
-                'heuristic2': self.heuristic2,
-                'heuristic3': self.heuristic3,
-                'heuristic4': self.heuristic4}
+        if self._score_fn is None:
+            self._score_fn = {name: getattr(self, name) for name in HEURISTICS}
+        return self._score_fn
 
     def ratio(self, state):
         area = len(state.liberties(None))
@@ -93,7 +248,7 @@ class CustomPlayer(DataPlayer):
         """ Convert from board index value to xy coordinates
 
         """
-        return (ind % (_WIDTH + 2), ind // (_WIDTH + 2))
+        return XY[ind]
    
     def score(self, state):
         #Number own moves available
@@ -109,138 +264,193 @@ class CustomPlayer(DataPlayer):
     
     def offensive(self, state):
         #Minimize opponent's available moves at a weighted cost against own
-        return self.score(state) - (self.opp_score(state)*2)
+        return self.evaluator('offensive')(state)
     
     def defensive(self, state):
         #Maximize own available moves at weighted cost against opponent's
-        return (self.score(state)*2) - self.opp_score(state)
+        return self.evaluator('defensive')(state)
     
     def defensive2offensive(self, state):
-        ratio = self.ratio(state)
-        if ratio <= 0.5:
-            return self.defensive(state)
-        else:
-            return self.offensive(state)
+        return self.evaluator('defensive2offensive')(state)
     
     def offensive2defensive(self, state):
-        ratio = self.ratio(state)
-        if ratio <= 0.5:
-            return self.offensive(state)
-        else:
-            return self.defensive(state)
+        return self.evaluator('offensive2defensive')(state)
         
     def center(self):
-        return (_WIDTH // 2, _HEIGHT // 2)
+        return CENTER
     
     def center2ind(self, state):
-        #Convert center xy position to loc index
-        center_xy = self.center()
-        for i in state.actions():
-            if self.ind2xy(i) == center_xy:
-                return i
+        #Loc index of the center square, if it is open
+        if state.board & (1 << CENTER_CELL):
+            return CENTER_CELL
           
     def favor_center(self, state):
-        # Get index of center square
-        center_xy = self.center()
-        
-        #Get player positions relative to center
-        own_loc = state.locs[self.player_id]
-        opp_loc = state.locs[1 - self.player_id]
-        
-        own_xy = self.ind2xy(own_loc)
-        opp_xy = self.ind2xy(opp_loc)
-        
-        own_distance = abs(own_xy[1] - center_xy[1]) + abs(own_xy[0] - center_xy[0])
-        opp_distance = abs(opp_xy[1] - center_xy[1]) + abs(opp_xy[0] - center_xy[0])
-        
-        #scale to value between -1 and +1, as less important than having more moves than opponent
-        return float(own_distance - opp_distance)/10
+        #Difference of the player distances to the center, scaled down as
+        #less important than having more moves than opponent
+        return self.evaluator('favor_center')(state)
     
     def block_opponent(self, state):
         # Find opponent moves that are legal moves for the agent and steal them
-        own_loc = state.locs[self.player_id]
-        opp_loc = state.locs[1 - self.player_id]
-        
-        own_liberties = state.liberties(own_loc)
-        opp_liberties = state.liberties(opp_loc) 
-        
-        equal_moves = list(set(own_liberties).intersection(opp_liberties))
-        
-        return self.offensive(state) + len(equal_moves)
+        return self.evaluator('block_opponent')(state)
     
     def baseline(self, state):
         #my_moves heuristic for baseline comparisons
-        return self.score(state) - self.opp_score(state)
+        return self.evaluator('baseline')(state)
     
     def heuristic1(self, state):
         #if players have equal numbers of moves, score to favor the center of the board
         #Otherwise, play offensive2defensive
-        if self.score(state) != self.opp_score(state):
-            return self.offensive2defensive(state)
-        else:
-            return self.favor_center(state)
+        return self.evaluator('heuristic1')(state)
         
     def heuristic2(self, state):
         #if players have equal numbers of moves, score to favor the center of the board
-        #Otherwise, play offensive2defensive
-        if self.score(state) != self.opp_score(state):
-            return self.defensive2offensive(state)
-        else:
-            return self.favor_center(state)
+        #Otherwise, play defensive2offensive
+        return self.evaluator('heuristic2')(state)
         
     def heuristic3(self, state):
         #if players have equal numbers of moves, score to favor the center of the board
-        #Otherwise, play offensive2defensive
-        if self.score(state) != self.opp_score(state):
-            return self.offensive(state)
-        else:
-            return self.favor_center(state)
+        #Otherwise, play offensive
+        return self.evaluator('heuristic3')(state)
         
     def heuristic4(self, state):
         #if players have equal numbers of moves, score to favor the center of the board
-        #Otherwise, play offensive2defensive
-        if self.score(state) != self.opp_score(state):
-            return self.defensive(state)
-        else:
-            return self.favor_center(state)
+        #Otherwise, play defensive
+        return self.evaluator('heuristic4')(state)
         
     
-    def alpha_beta(self, state, score_func, depth):
-       
-        def min_value(state, alpha, beta, depth):
+    def evaluator(self, score_func):
+        """ Leaf evaluation function for a heuristic name in score_fn. The
+        heuristic methods delegate to it, so each heuristic is only defined
+        in GamePlaying.evaluation
+        """
+        return evaluator(score_func, self.player_id)
+
+    def alpha_beta(self, state, score_func, depth, deadline=None,
+                   table=None, ordering=None, alpha=float("-inf"),
+                   beta=float("inf")):
+        """ Depth-limited alpha-beta search. Raises SearchTimeout once
+        time.perf_counter() passes the deadline, if given. Positions are
+        looked up in and stored to the transposition table, so positions
+        reached through different move orders are only searched once.
+        Moves are searched in the order given by the MoveOrdering, if
+        move ordering is enabled. The number of nodes visited is added to
+        self.nodes
+        """
+        clock = time.perf_counter
+        if deadline is None:
+            deadline = float("inf")
+        if table is None:
+            table = TranspositionTable(self.tt_size)
+        if ordering is None and self.move_ordering:
+            ordering = MoveOrdering()
+        root_depth = depth
+        nodes = 0
+        evaluate = self.evaluator(score_func)
+
+        def probe(key, depth, alpha, beta):
+            # returns the stored value if it decides the node, the window
+            # narrowed by the stored bound, and the stored best move
+            entry = table.get(key)
+            if entry is None:
+                return None, alpha, beta, None
+            if entry.depth < depth:
+                return None, alpha, beta, entry.move
+            if abs(entry.value) != float("inf"):
+                # the stored value came from a search cut off at a horizon
+                self._horizon = True
+            if entry.flag == EXACT:
+                return entry.value, alpha, beta, entry.move
+            if entry.flag == LOWER:
+                alpha = max(alpha, entry.value)
+            else:
+                beta = min(beta, entry.value)
+            if alpha >= beta:
+                return entry.value, alpha, beta, entry.move
+            return None, alpha, beta, entry.move
+
+        def actions(state, hash_move, depth):
+            if ordering is None:
+                return state.actions()
+            return ordering.order(state, state.actions(), hash_move,
+                                  root_depth - depth)
+
+        def cutoff(state, move, depth):
+            if ordering is not None:
+                ordering.update(state, move, root_depth - depth, depth)
+
+        def min_value(state, key, alpha, beta, depth):
+            nonlocal nodes
+            nodes += 1
+            if clock() >= deadline: raise SearchTimeout()
             if state.terminal_test(): return state.utility(self.player_id)
-            if depth <= 0: return self.score_fn[score_func](state)
+            if depth <= 0:
+                self._horizon = True
+                return evaluate(state)
+            stored, alpha, beta, hash_move = probe(key, depth, alpha, beta)
+            if stored is not None: return stored
+            window = alpha, beta
             value = float("inf")
-            for action in state.actions():
-                value = min(value, max_value(state.result(action), alpha, beta, depth - 1))
+            best = None
+            for action in actions(state, hash_move, depth):
+                child = max_value(state.result(action),
+                                  update_hash(key, state, action),
+                                  alpha, beta, depth - 1)
+                if best is None or child < value:
+                    value, best = child, action
                 if value <= alpha:
-                    return value
-                else:
-                    beta = min(beta, value)
+                    cutoff(state, best, depth)
+                    break
+                beta = min(beta, value)
+            table.put(key, depth, bound(value, *window), value, best)
             return value
 
-        def max_value(state, alpha, beta, depth):
+        def max_value(state, key, alpha, beta, depth):
+            nonlocal nodes
+            nodes += 1
+            if clock() >= deadline: raise SearchTimeout()
             if state.terminal_test(): return state.utility(self.player_id)
-            if depth <= 0: return self.score_fn[score_func](state)
+            if depth <= 0:
+                self._horizon = True
+                return evaluate(state)
+            stored, alpha, beta, hash_move = probe(key, depth, alpha, beta)
+            if stored is not None: return stored
+            window = alpha, beta
             value = float("-inf")
-            for action in state.actions():
-                value = max(value, min_value(state.result(action), alpha, beta, depth - 1))
+            best = None
+            for action in actions(state, hash_move, depth):
+                child = min_value(state.result(action),
+                                  update_hash(key, state, action),
+                                  alpha, beta, depth - 1)
+                if best is None or child > value:
+                    value, best = child, action
                 if value >= beta:
-                    return value
-                else:
-                    alpha = max(alpha, value)
+                    cutoff(state, best, depth)
+                    break
+                alpha = max(alpha, value)
+            table.put(key, depth, bound(value, *window), value, best)
             return value
 
-        alpha = float("-inf")
-        beta = float("+inf")
-        depth = depth
+        # the root is a max node searched with the caller's window. The best
+        # move of the previous iteration, stored in the table, goes first
+        window = alpha, beta
         best_score = float("-inf")
         best_move = None
+        key = zobrist_hash(state)
+        entry = table.get(key)
+        hash_move = entry.move if entry is not None else None
 
-        for a in state.actions():
-            v = min_value(state.result(a), alpha, beta, depth - 1)
-            alpha = max(alpha, v)
-            if v >= best_score:
-                best_score = v
-                best_move = a
+        try:
+            for a in actions(state, hash_move, depth):
+                v = min_value(state.result(a), update_hash(key, state, a),
+                              alpha, beta, depth - 1)
+                if best_move is None or v > best_score:
+                    best_score = v
+                    best_move = a
+                if best_score >= beta:
+                    break
+                alpha = max(alpha, v)
+        finally:
+            self.nodes += nodes
+        table.put(key, depth, bound(best_score, *window), best_score,
+                  best_move)
         return best_move
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from GamePlaying.bitboard import Isolation
+from GamePlaying.transposition import TranspositionTable, zobrist_hash
+
+"""Offline opening book for CustomPlayer. Every position of the first plies
+   of the game is searched far deeper than the per-move time limit allows,
+   and the best move of each position is stored under its Zobrist hash. The
+   book is a plain dict of ints, pickled to data.pickle, which DataPlayer
+   loads into self.data so the player can answer opening moves with a
+   single lookup
+
+   Usage:
+       python -m GamePlaying.opening_book --plies 2 --depth 4 --jobs 4
+"""
+
+
+def positions(plies):
+    """
+    All positions reachable before the given ply, each listed once
+
+    Parameters
+    ----------
+    plies : int
+        Positions with ply_count < plies are listed
+
+    Returns
+    -------
+    list of bitboard.Isolation
+    """
+
+    level = [Isolation()]
+    found = []
+
+    for ply in range(plies):
+        level = [state for state in level if not state.terminal_test()]
+        found.extend(level)
+        # the positions of the next ply are not listed, so do not build them
+        if ply == plies - 1:
+            break
+        level = list({state.result(action)
+                      for state in level for action in state.actions()})
+
+    return found
+
+
+@lru_cache(maxsize=None)
+def _searcher(score_func):
+    """CustomPlayer of this process that searches the book positions. It is
+       created once, as DataPlayer reads data.pickle each time a player is
+       created, and that file is the book being built rather than one to
+       play from"""
+
+    from GamePlaying.my_custom_player import CustomPlayer
+
+    player = CustomPlayer(0, score_func=score_func)
+    player.data = None
+
+    return player
+
+
+def best_move(task):
+    """Deep search of a single position. Returns its hash and best move"""
+
+    state, depth, score_func = task
+    player = _searcher(score_func)
+    player.player_id = state.player()
+    move = player.alpha_beta(state, score_func, depth,
+                             table=TranspositionTable(1 << 18))
+
+    return zobrist_hash(state), int(move)
+
+
+def build_book(plies=2, depth=4, score_func='defensive', n_jobs=1):
+    """
+    Search every position of the first plies of the game
+
+    Parameters
+    ----------
+    plies : int
+        Positions with fewer moves played than this are included
+    depth : int
+        Depth of the alpha-beta search of each position
+    score_func : str
+        Heuristic of the search. See CustomPlayer.score_fn
+    n_jobs : int
+        Number of processes to search with
+
+    Returns
+    -------
+    dict
+        Best move, as an int, of each position, keyed by its Zobrist hash
+    """
+
+    tasks = [(state, depth, score_func) for state in positions(plies)]
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(n_jobs) as pool:
+            return dict(pool.map(best_move, tasks,
+                                 chunksize=max(1, len(tasks) // (4 * n_jobs))))
+
+    return dict(map(best_move, tasks))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Build the opening book of CustomPlayer')
+    parser.add_argument('--plies', type=int, default=2)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--score-func', default='defensive')
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--output', default='data.pickle')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    book = build_book(args.plies, args.depth, args.score_func, args.jobs)
+
+    with open(args.output, 'wb') as f:
+        pickle.dump(book, f)
+
+    print('{} positions in {:.1f}s written to {}'.format(
+        len(book), time.perf_counter() - start, args.output))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from GamePlaying.bitboard import Isolation
+
+isolation = pytest.importorskip('isolation')
+
+
+def _playout(seed):
+    """States of a random game played with the harness's Isolation"""
+
+    rng = random.Random(seed)
+    state = isolation.Isolation()
+    states = [state]
+    while not state.terminal_test():
+        state = state.result(rng.choice(state.actions()))
+        states.append(state)
+    return states
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_bitboard_matches_harness(seed):
+    states = _playout(seed)
+
+    for state, after in zip(states, states[1:] + [None]):
+        board = Isolation.from_state(state)
+
+        assert sorted(board.actions()) == sorted(state.actions())
+        for loc in state.locs:
+            assert sorted(board.liberties(loc)) == sorted(state.liberties(loc))
+        assert board.terminal_test() == state.terminal_test()
+        for player_id in (0, 1):
+            assert board.utility(player_id) == state.utility(player_id)
+
+        if after is not None:
+            action = after.locs[state.player()]
+            if state.locs[state.player()] is not None:
+                action -= state.locs[state.player()]
+            assert board.result(action) == Isolation.from_state(after)
+
+
+def test_game_ends_when_opponent_is_stuck():
+    # games where the player to move still has liberties when the game ends
+    ends = [states[-1] for states in map(_playout, range(200))
+            if states[-1]._has_liberties(states[-1].player())]
+    assert ends
+
+    for state in ends:
+        board = Isolation.from_state(state)
+        assert board.terminal_test()
+        assert board.utility(state.player()) == float('inf')
+        assert board.utility(1 - state.player()) == float('-inf')
@@ -0,0 +1,22 @@
+import pickle
+
+from GamePlaying.transposition import EXACT, LOWER, TranspositionTable
+
+
+def test_pickle_keeps_current_search_only():
+    table = TranspositionTable(64)
+    table.new_search()
+    table.put(1, 3, EXACT, 0.5, 8)
+    table.put(2, 1, LOWER, float('inf'), None)
+    table.new_search()
+    table.put(65, 2, EXACT, -1.0, -15)
+    table.put(3, 4, LOWER, 2.0, 27)
+
+    copy = pickle.loads(pickle.dumps(table))
+
+    assert (copy.size, copy.generation, copy.hits, copy.stores) == \
+        (table.size, table.generation, table.hits, table.stores)
+    assert copy.get(65) == table.get(65)
+    assert copy.get(3) == table.get(3)
+    assert copy.get(2) is None
+    assert len(copy) == 2
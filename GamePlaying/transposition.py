@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import random
+from collections import namedtuple
+from itertools import repeat
+
+from GamePlaying.bitboard import CELLS, _SIZE
+
+"""Zobrist hashing and a transposition table for the Isolation search.
+   A position is hashed from its blocked cells, both player locations and
+   the side to move. The hash of a successor is updated incrementally from
+   the hash of its parent, so it costs a few XORs per node. The keys come
+   from a fixed seed, so hashes are the same in every process and across
+   turns"""
+
+
+_rng = random.Random(20210421)
+
+BLOCKED = [_rng.getrandbits(64) for _ in range(_SIZE)]
+LOCATION = ([_rng.getrandbits(64) for _ in range(_SIZE)],
+            [_rng.getrandbits(64) for _ in range(_SIZE)])
+SIDE = _rng.getrandbits(64)
+
+del _rng
+
+
+# bound types of a stored value
+EXACT, LOWER, UPPER = 0, 1, 2
+
+Entry = namedtuple('Entry', ['key', 'depth', 'flag', 'value', 'move',
+                             'generation'])
+
+
+def zobrist_hash(state):
+    """Hash of an Isolation state, computed from scratch"""
+
+    key = 0
+    for cell in CELLS:
+        if not state.board & (1 << cell):
+            key ^= BLOCKED[cell]
+
+    for player, loc in enumerate(state.locs):
+        if loc is not None:
+            key ^= LOCATION[player][loc]
+
+    if state.ply_count % 2:
+        key ^= SIDE
+
+    return key
+
+
+def update_hash(key, state, action):
+    """Hash of state.result(action), given the hash of state"""
+
+    player = state.ply_count % 2
+    prev_loc = state.locs[player]
+    loc = action if prev_loc is None else prev_loc + action
+
+    key ^= BLOCKED[loc] ^ LOCATION[player][loc] ^ SIDE
+    if prev_loc is not None:
+        key ^= LOCATION[player][prev_loc]
+
+    return key
+
+
+def bound(value, alpha, beta):
+    """Bound type of a value returned by a search with window (alpha,
+       beta)"""
+
+    if value <= alpha:
+        return UPPER
+    if value >= beta:
+        return LOWER
+    return EXACT
+
+
+class TranspositionTable:
+    """
+    Fixed-size table of search results indexed by Zobrist hash. Each hash
+    maps to a single slot. A slot is replaced by a result from a search at
+    least as deep, or by any result once it is left over from a previous
+    search, so the table never grows and favours the most expensive
+    results. Plain Python data only, so it can be carried between turns in
+    a player's context. Only the entries of the current search are pickled,
+    packed into one flat list, so that the harness can copy the context
+    within the time limit of a move
+
+    Parameters
+    ----------
+    size : int
+        Number of slots
+
+    Attributes
+    ----------
+    generation : int
+        Number of searches started with new_search()
+
+    hits, stores : int
+        Number of successful lookups and stored results
+    """
+
+    def __init__(self, size=1 << 14):
+        self.size = size
+        self.slots = [None] * size
+        self.generation = 0
+        self.hits = 0
+        self.stores = 0
+
+    def __len__(self):
+        return sum(entry is not None for entry in self.slots)
+
+    def __getstate__(self):
+        generation = self.generation
+        packed = [field for index, entry in enumerate(self.slots)
+                  if entry is not None and entry.generation == generation
+                  for field in (index,) + entry[:5]]
+        return (self.size, generation, self.hits, self.stores, packed)
+
+    def __setstate__(self, state):
+        self.size, self.generation, self.hits, self.stores, packed = state
+        self.slots = slots = [None] * self.size
+        entries = map(Entry, packed[1::6], packed[2::6], packed[3::6],
+                      packed[4::6], packed[5::6], repeat(self.generation))
+        for index, entry in zip(packed[::6], entries):
+            slots[index] = entry
+
+    def new_search(self):
+        """Start a new search. Entries of earlier searches can then be
+           replaced regardless of their depth"""
+        self.generation += 1
+
+    def get(self, key):
+        """The entry stored for a hash, or None"""
+        entry = self.slots[key % self.size]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def put(self, key, depth, flag, value, move=None):
+        """Store the result of a search of the given depth"""
+        index = key % self.size
+        entry = self.slots[index]
+        if (entry is None or entry.generation != self.generation
+                or depth >= entry.depth):
+            self.slots[index] = Entry(key, depth, flag, value, move,
+                                      self.generation)
+            self.stores += 1
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import copy
+import time
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from OutlierDetection.ent import EntropyProblem, check_random_state
+
+"""Batch outlier detection over many columns of a table with many random
+   restarts per column"""
+
+
+def _run_restart(task):
+    """Solve a single restart and return its row of the result table"""
+    
+    column, restart, problem, solver, maximize = task
+    
+    start = time.perf_counter()
+    if maximize:
+        solution = solver.max_solve(problem)
+    else:
+        solution = solver.min_solve(problem)
+    wall_time = time.perf_counter() - start
+    
+    return {'column': column,
+            'restart': restart,
+            'removed': solver.result.values.tolist(),
+            'entropy': solver.result.entropy.tolist(),
+            'wall_time': wall_time}
+
+
+def detect_outliers(df, solver, n_restarts=10, columns=None, size=20,
+                    search='window', n_jobs=1, executor=None,
+                    maximize=False, random_state=None):
+    """
+    Run entropy outlier detection on each column of a table, with several
+    random restarts per column. The count table of each column is built
+    once and shared by all of its restarts
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Input table
+    solver : BaseOptimizer
+        Optimizer such as HillClimber or LocalBeamSearch. Each restart runs
+        on its own copy of the solver, which gets its own random stream if
+        the solver has a random_state
+    n_restarts : int
+        Number of random initial states per column
+    columns : list, optional
+        Columns to scan. Defaults to all columns of df
+    size : int
+        Number of neighbors to explore, capped at the column length
+    search : str
+        'window' or 'value'. See EntropyProblem
+    n_jobs : int
+        Number of worker threads used when no executor is given
+    executor : concurrent.futures.Executor, optional
+        Executor used to run the restarts in parallel
+    maximize : bool
+        Use the solver's max_solve instead of min_solve
+    random_state : None, int, SeedSequence or Generator
+        Seed of the run. Each restart and its copy of the solver get their
+        own independent streams spawned from it, so results do not depend
+        on how restarts are scheduled across workers. Defaults to the
+        random_state of the solver
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per column and restart, with the values removed, the
+        entropy before the search and after each iteration, and the wall
+        time of the search in seconds
+    """
+    
+    if columns is None:
+        columns = list(df.columns)
+        
+    if random_state is None:
+        random_state = getattr(solver, 'random_state', None)
+        
+    rng = check_random_state(random_state)
+    streams = iter(rng.spawn(len(columns) * (n_restarts + 1)))
+    solver_streams = iter(rng.spawn(len(columns) * n_restarts))
+        
+    tasks = []
+    for column in columns:
+        problem = EntropyProblem(df[column], size=min(size, len(df)),
+                                 search=search, random_state=next(streams))
+        for restart in range(n_restarts):
+            # a shared seed would restart every copy from the same state,
+            # and a shared Generator would be drawn from by several threads
+            restart_solver = copy.copy(solver)
+            if hasattr(solver, 'random_state'):
+                restart_solver.random_state = next(solver_streams)
+                
+            tasks.append((column, restart,
+                          problem.restart(random_state=next(streams)),
+                          restart_solver, maximize))
+            
+    if executor is not None:
+        rows = list(executor.map(_run_restart, tasks))
+    elif n_jobs > 1:
+        with ThreadPoolExecutor(n_jobs) as pool:
+            rows = list(pool.map(_run_restart, tasks))
+    else:
+        rows = list(map(_run_restart, tasks))
+        
+    return pd.DataFrame(rows, columns=['column', 'restart', 'removed',
+                                       'entropy', 'wall_time'])
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from multiprocessing import get_context
+
+"""Benchmark harness for the OutlierDetection optimizers. Times HillClimber
+   and LocalBeamSearch on synthetic columns with injected outliers over a
+   grid of data sizes, cardinalities, value kinds and input types, records
+   peak memory, and writes a JSON report that can be compared against a
+   baseline report to catch regressions. The import time of the core
+   modules is measured in fresh interpreters, and importing them must not
+   load the plotting stack or pandas
+
+   Usage:
+       python -m OutlierDetection.benchmark --output report.json
+       python -m OutlierDetection.benchmark --sizes 1e3 1e8 --compare base.json
+       python -m OutlierDetection.benchmark --imports-only
+"""
+
+
+SOLVERS = ('HillClimber', 'LocalBeamSearch')
+INPUTS = ('ndarray', 'pandas')
+KINDS = ('categorical', 'numeric')
+
+# modules that must import with numpy alone, and what they must not load
+CORE_MODULES = ('OutlierDetection.ent', 'OutlierDetection.optimizer')
+HEAVY_MODULES = ('pandas', 'matplotlib', 'seaborn')
+
+_IMPORT_SCRIPT = """
+import json, sys, time
+import numpy
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'import_time': elapsed,
+                   'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def make_column(n_rows, cardinality, kind='categorical', outlier_frac=0.001,
+                seed=0):
+    """
+    Generate a synthetic column with Zipf-distributed values and injected
+    outliers
+
+    Parameters
+    ----------
+    n_rows : int
+        Number of rows
+    cardinality : int
+        Number of distinct regular values
+    kind : str
+        'categorical' for string values or 'numeric' for integers
+    outlier_frac : float
+        Fraction of rows replaced by rare outlier values
+    seed : int
+        Seed of the generator
+
+    Returns
+    -------
+    ndarray
+    """
+
+    rng = np.random.default_rng(seed)
+
+    weights = 1. / np.arange(1, cardinality + 1)
+    data = rng.choice(cardinality, size=n_rows, p=weights / weights.sum())
+
+    n_outliers = max(1, int(n_rows * outlier_frac))
+    positions = rng.choice(n_rows, size=n_outliers, replace=False)
+    data[positions] = cardinality + rng.integers(50, size=n_outliers)
+
+    if kind == 'categorical':
+        return np.char.add('v', data.astype(str)).astype(object)
+
+    return data
+
+
+def _peak_rss():
+    """Peak resident set size of this process in bytes"""
+
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_case(case):
+    """
+    Time a single benchmark case. Meant to run in a fresh process so that
+    the peak RSS only reflects this case
+
+    Parameters
+    ----------
+    case : dict
+        Benchmark parameters, as produced by cases()
+
+    Returns
+    -------
+    dict
+        The case parameters with the timings and memory added
+    """
+
+    import pandas as pd
+    from OutlierDetection.ent import EntropyProblem
+    from OutlierDetection import optimizer
+
+    data = make_column(case['n_rows'], case['cardinality'], kind=case['kind'],
+                       seed=case['seed'])
+    if case['input'] == 'pandas':
+        data = pd.Series(data)
+
+    solver_cls = getattr(optimizer, case['solver'])
+    if case['solver'] == 'LocalBeamSearch':
+        solver = solver_cls(epochs=case['epochs'],
+                            beam_width=case['beam_width'])
+    else:
+        solver = solver_cls(epochs=case['epochs'])
+
+    build_times, solve_times = [], []
+    for _ in range(case['repeat']):
+        start = time.perf_counter()
+        problem = EntropyProblem(data, size=case['size'],
+                                 search=case['search'],
+                                 random_state=case['seed'])
+        build_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        solution = solver.min_solve(problem)
+        solve_times.append(time.perf_counter() - start)
+
+    result = dict(case)
+    result.update({'build_time': min(build_times),
+                   'solve_time': min(solve_times),
+                   'removed': int(len(solution.removed)),
+                   'entropy': float(solution.base),
+                   'peak_rss': _peak_rss()})
+
+    return result
+
+
+def measure_import(module, repeat=5):
+    """
+    Time the import of a module in fresh interpreters. numpy is imported
+    before the timer starts, since every caller pays for it anyway
+
+    Parameters
+    ----------
+    module : str
+        Dotted module name
+    repeat : int
+        Number of interpreters to start. The fastest import is kept
+
+    Returns
+    -------
+    dict
+        The module, its import time in seconds and the heavy modules it
+        loaded
+    """
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = _IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES)
+
+    times, heavy = [], []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', script], cwd=root,
+                                check=True, capture_output=True,
+                                text=True).stdout
+        result = json.loads(output)
+        times.append(result['import_time'])
+        heavy = result['heavy']
+
+    return {'module': module, 'import_time': min(times), 'heavy': heavy}
+
+
+def compare_imports(imports, baseline, threshold=1.25):
+    """
+    Check import timings for heavy modules and regressions against a
+    baseline report
+
+    Parameters
+    ----------
+    imports : list of dict
+        Results of measure_import()
+    baseline : dict, optional
+        Report loaded from a previous run
+    threshold : float
+        Ratio of current to baseline import time above which an import is
+        reported as a regression
+
+    Returns
+    -------
+    list of dict
+        One entry per module that loads a heavy module or regressed
+    """
+
+    previous = {}
+    if baseline is not None:
+        previous = {r['module']: r for r in baseline.get('imports', [])}
+    regressions = []
+
+    for result in imports:
+        if result['heavy']:
+            regressions.append({'module': result['module'],
+                                'reason': 'loads {}'.format(
+                                    ', '.join(result['heavy']))})
+            continue
+
+        old = previous.get(result['module'])
+        if old is None or old['import_time'] <= 0:
+            continue
+
+        ratio = result['import_time'] / old['import_time']
+        if ratio > threshold:
+            regressions.append({'module': result['module'],
+                                'reason': 'import {:.4f}s -> {:.4f}s '
+                                          '({:.2f}x)'.format(
+                                              old['import_time'],
+                                              result['import_time'],
+                                              ratio)})
+
+    return regressions
+
+
+def cases(sizes, cardinalities, kinds=KINDS, inputs=INPUTS, solvers=SOLVERS,
+          size=50, epochs=20, beam_width=8, search='window', repeat=3,
+          seed=0):
+    """Grid of benchmark cases, skipping cardinalities above the data size"""
+
+    for n_rows, cardinality, kind, input_type, solver in product(
+            sizes, cardinalities, kinds, inputs, solvers):
+        if cardinality > n_rows:
+            continue
+
+        yield {'n_rows': int(n_rows),
+               'cardinality': int(cardinality),
+               'kind': kind,
+               'input': input_type,
+               'solver': solver,
+               'size': int(min(size, n_rows)),
+               'epochs': epochs,
+               'beam_width': beam_width,
+               'search': search,
+               'repeat': repeat,
+               'seed': seed}
+
+
+def _case_key(result):
+    return tuple(result[k] for k in ('n_rows', 'cardinality', 'kind',
+                                     'input', 'solver', 'search'))
+
+
+def compare(results, baseline, threshold=1.25):
+    """
+    Compare solve times against a baseline report
+
+    Parameters
+    ----------
+    results : list of dict
+        Results of the current run
+    baseline : dict
+        Report loaded from a previous run
+    threshold : float
+        Ratio of current to baseline solve time above which a case is
+        reported as a regression
+
+    Returns
+    -------
+    list of dict
+        One entry per regressed case with the baseline and current times
+    """
+
+    previous = {_case_key(r): r for r in baseline['results']}
+    regressions = []
+
+    for result in results:
+        old = previous.get(_case_key(result))
+        if old is None or old['solve_time'] <= 0:
+            continue
+
+        ratio = result['solve_time'] / old['solve_time']
+        if ratio > threshold:
+            regressions.append({'case': dict(zip(('n_rows', 'cardinality',
+                                                  'kind', 'input', 'solver',
+                                                  'search'),
+                                                 _case_key(result))),
+                                'baseline': old['solve_time'],
+                                'current': result['solve_time'],
+                                'ratio': ratio})
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the OutlierDetection optimizers')
+    parser.add_argument('--sizes', nargs='+', type=float,
+                        default=[1e3, 1e4, 1e5, 1e6])
+    parser.add_argument('--cardinalities', nargs='+', type=int,
+                        default=[10, 1000, 100000])
+    parser.add_argument('--kinds', nargs='+', default=list(KINDS),
+                        choices=KINDS)
+    parser.add_argument('--inputs', nargs='+', default=list(INPUTS),
+                        choices=INPUTS)
+    parser.add_argument('--solvers', nargs='+', default=list(SOLVERS),
+                        choices=SOLVERS)
+    parser.add_argument('--size', type=int, default=50)
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--beam-width', type=int, default=8)
+    parser.add_argument('--search', default='window',
+                        choices=('window', 'value'))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', help='Baseline JSON report')
+    parser.add_argument('--threshold', type=float, default=1.25)
+    parser.add_argument('--imports-only', action='store_true',
+                        help='Only measure the import time of the core '
+                             'modules')
+    args = parser.parse_args(argv)
+
+    imports = [measure_import(module) for module in CORE_MODULES]
+    for result in imports:
+        print('{module:<27} import {import_time:9.4f}s'.format(**result))
+
+    results = []
+    sizes = [] if args.imports_only else [int(n) for n in args.sizes]
+    for case in cases(sizes, args.cardinalities,
+                      kinds=args.kinds, inputs=args.inputs,
+                      solvers=args.solvers, size=args.size,
+                      epochs=args.epochs, beam_width=args.beam_width,
+                      search=args.search, repeat=args.repeat,
+                      seed=args.seed):
+
+        # fresh process per case so the peak RSS is not shared
+        with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as pool:
+            result = pool.submit(run_case, case).result()
+
+        results.append(result)
+        print('{n_rows:>11} {cardinality:>7} {kind:<11} {input:<7} '
+              '{solver:<15} build {build_time:9.4f}s solve {solve_time:9.4f}s '
+              'rss {rss:8.1f}MB'.format(rss=result['peak_rss'] / 2**20,
+                                        **result))
+
+    import pandas as pd
+
+    report = {'meta': {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'python': platform.python_version(),
+                       'numpy': np.__version__,
+                       'pandas': pd.__version__,
+                       'platform': platform.platform()},
+              'imports': imports,
+              'results': results}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        report['regressions'] = compare(results, baseline,
+                                        threshold=args.threshold)
+
+    import_regressions = compare_imports(imports, baseline,
+                                         threshold=args.threshold)
+    if import_regressions:
+        report['import_regressions'] = import_regressions
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for regression in report.get('regressions', []):
+        print('REGRESSION {case}: {baseline:.4f}s -> {current:.4f}s '
+              '({ratio:.2f}x)'.format(**regression))
+    for regression in import_regressions:
+        print('IMPORT REGRESSION {module}: {reason}'.format(**regression))
+
+    return 1 if report.get('regressions') or import_regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from abc import ABCMeta, abstractmethod
+
+from OutlierDetection.ent import check_random_state
+
+"""Streaming discretization of continuous data, so that entropy outlier
+   detection can run on real-valued columns. Binners are fitted in a single
+   pass over chunks of the data and map values to integer bin codes. Missing
+   values get a bin of their own, after the last regular bin"""
+
+
+class BaseBinner(metaclass=ABCMeta):
+    """Abstract base class for binners. This class is not meant to be instantiated
+       directly
+
+    Parameters:
+    ----------
+    n_bins : int
+        Number of regular bins
+
+    Attributes:
+    ----------
+    edges : ndarray of float
+        Bin edges, set once the binner is fitted
+
+    """
+
+    def __init__(self, n_bins=64):
+        self.n_bins = n_bins
+        self.edges = None
+
+
+    @property
+    def is_fitted(self):
+        return self.edges is not None
+
+
+    @abstractmethod
+    def partial_fit(self, chunk):
+        """Update the binner with a chunk of data"""
+        pass
+
+
+    @abstractmethod
+    def _finalize(self):
+        """Compute the bin edges from the state accumulated by
+           partial_fit()"""
+        pass
+
+
+    def fit(self, data, chunksize=1 << 20):
+        """
+        Fit the binner in a single pass over the data
+
+        Parameters
+        ----------
+        data : array-like or iterable of array-like
+            1D data, or an iterable of 1D chunks
+        chunksize : int
+            Number of values per chunk when data is an array
+
+        Returns
+        -------
+        self
+        """
+
+        chunks = data
+        if hasattr(data, '__len__') and hasattr(data, 'shape'):
+            chunks = (data[start:start + chunksize]
+                      for start in range(0, len(data), chunksize))
+
+        for chunk in chunks:
+            self.partial_fit(chunk)
+
+        self._finalize()
+
+        return self
+
+
+    @property
+    def labels(self):
+        """Left edge of each bin, with NaN as the label of the missing value
+           bin"""
+
+        self._check_is_fitted()
+
+        return np.append(self.edges[:-1], np.nan)
+
+
+    def _check_is_fitted(self):
+        if not self.is_fitted:
+            raise Exception('Binner has not been fitted')
+
+
+    def transform(self, values):
+        """
+        Map values to bin codes. Values outside the fitted range fall into
+        the first or last bin
+
+        Parameters
+        ----------
+        values : array-like
+            1D values, or a single value
+
+        Returns
+        -------
+        ndarray of int
+            Bin code of each value, between 0 and len(labels) - 1, with the
+            same shape as values
+        """
+
+        self._check_is_fitted()
+
+        values = np.asarray(values, dtype=float)
+        n_bins = len(self.edges) - 1
+
+        codes = np.searchsorted(self.edges[1:-1], values, side='right')
+
+        return np.where(np.isnan(values), n_bins, codes)
+
+
+class FixedWidthBinner(BaseBinner):
+    """
+    Bins of equal width between the minimum and maximum of the data
+
+    Parameters:
+    ----------
+    n_bins : int
+        Number of bins
+
+    value_range : tuple of float, optional
+        Lower and upper bound of the bins. If given, the binner does not
+        need to be fitted
+
+    """
+
+    def __init__(self, n_bins=64, value_range=None):
+        super().__init__(n_bins)
+        self.value_range = value_range
+        self._min = np.inf
+        self._max = -np.inf
+
+        if value_range is not None:
+            self._min, self._max = value_range
+            self._finalize()
+
+
+    def partial_fit(self, chunk):
+        """Update the running minimum and maximum with a chunk of data"""
+
+        if self.value_range is not None:
+            return self
+
+        chunk = np.asarray(chunk, dtype=float)
+        chunk = chunk[~np.isnan(chunk)]
+
+        if len(chunk):
+            self._min = min(self._min, chunk.min())
+            self._max = max(self._max, chunk.max())
+
+        return self
+
+
+    def _finalize(self):
+        low, high = self._min, self._max
+
+        if not np.isfinite(low):
+            low, high = 0., 1.
+        if high <= low:
+            high = low + 1.
+
+        self.edges = np.linspace(low, high, self.n_bins + 1)
+
+
+class QuantileBinner(BaseBinner):
+    """
+    Bins with roughly equal numbers of values. The quantiles are estimated
+    from a uniform reservoir sample of the data, kept in a single streaming
+    pass with memory bounded by sample_size. Duplicate edges are merged, so
+    there may be fewer than n_bins bins
+
+    Parameters:
+    ----------
+    n_bins : int
+        Number of bins
+
+    sample_size : int
+        Size of the reservoir sample used to estimate the quantiles
+
+    random_state : None, int, SeedSequence or Generator
+        Source of randomness for the reservoir sample. See
+        ent.check_random_state()
+
+    """
+
+    def __init__(self, n_bins=64, sample_size=100000, random_state=None):
+        super().__init__(n_bins)
+        self.sample_size = sample_size
+        self.random_state = check_random_state(random_state)
+        self._sample = np.empty(0)
+        self._seen = 0
+
+
+    def partial_fit(self, chunk):
+        """Update the reservoir sample with a chunk of data"""
+
+        chunk = np.asarray(chunk, dtype=float)
+        chunk = chunk[~np.isnan(chunk)]
+
+        # fill the reservoir first
+        free = self.sample_size - len(self._sample)
+        if free > 0:
+            self._sample = np.concatenate([self._sample, chunk[:free]])
+            self._seen += len(chunk[:free])
+            chunk = chunk[free:]
+
+        if len(chunk):
+            # value i of the stream replaces a random slot with probability
+            # sample_size / (i + 1)
+            seen = self._seen + np.arange(1, len(chunk) + 1)
+            slots = self.random_state.random(len(chunk)) * seen
+            slots = slots.astype(np.int64)
+            keep = slots < self.sample_size
+            self._sample[slots[keep]] = chunk[keep]
+            self._seen += len(chunk)
+
+        return self
+
+
+    def _finalize(self):
+        if len(self._sample) == 0:
+            self.edges = np.array([0., 1.])
+            return
+
+        quantiles = np.linspace(0, 1, self.n_bins + 1)
+        edges = np.unique(np.quantile(self._sample, quantiles))
+
+        if len(edges) == 1:
+            edges = np.array([edges[0], edges[0] + 1.])
+
+        self.edges = edges
@@ -7,10 +7,142 @@ Created on Mon Mar 15 14:44:24 2021
 """
 
 
+import copy
 import random
+import sys
 import numpy as np
 from math import log, e
-import pandas as pd
+from collections import namedtuple
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'computations', 'histograms',
+                                     'bytes_copied'])
+
+# Number of rows counted at a time when building a count table, so that
+# memory-mapped input is never loaded into memory as a whole
+_CHUNK_SIZE = 1 << 20
+
+
+def check_random_state(seed):
+    """
+    Turn a seed into a np.random.Generator
+
+    Parameters
+    ----------
+    seed : None, int, SeedSequence or Generator
+        None draws a seed from the global NumPy random state, so that
+        np.random.seed() still makes runs reproducible. An int or
+        SeedSequence seeds a new Generator. A Generator is returned as is
+
+    Returns
+    -------
+    np.random.Generator
+    """
+    if seed is None:
+        return np.random.default_rng(np.random.randint(np.iinfo(np.int32).max))
+    
+    if isinstance(seed, np.random.Generator):
+        return seed
+    
+    return np.random.default_rng(seed)
+
+
+def _is_pandas(data):
+    """Whether data is a pandas Series or DataFrame, without importing
+       pandas. Data cannot be a pandas object if pandas was never loaded"""
+    pd = sys.modules.get('pandas')
+    return pd is not None and isinstance(data, (pd.DataFrame, pd.Series))
+
+
+def _new_stats():
+    """Counters shared by a problem and its successors. See cache_info()"""
+    return {'hits': 0, 'computations': 0, 'histograms': 0, 'bytes_copied': 0}
+
+
+def _nbytes(data):
+    """Size in bytes of an array or pandas object"""
+    if hasattr(data, 'memory_usage'):
+        return int(np.sum(data.memory_usage()))
+    return np.asarray(data).nbytes
+
+
+def _xlogx(x):
+    """Return x * log(x), taking 0 * log(0) as 0"""
+    return x * log(x, e) if x > 0 else 0.
+
+
+def _histogram_terms(counts):
+    """Return the number of observations, number of distinct values and
+       sum of c * log(c) of a count table"""
+    counts = [c for c in np.asarray(counts).tolist() if c > 0]
+    return sum(counts), len(counts), sum(_xlogx(c) for c in counts)
+
+
+def _entropy(n_labels, plogp, n_classes):
+    """Information entropy in base e from the terms of a count table, using
+       H = log(n) - sum(c * log(c)) / n"""
+    if n_labels <= 1:
+        return 0
+    
+    if n_classes <= 1:
+        return 0
+    
+    return log(n_labels, e) - plogp / n_labels
+
+
+def _value_counts(data):
+    """Sorted distinct values and their counts of a 1D array, counted one
+       chunk at a time"""
+    values, counts = np.unique(data[:_CHUNK_SIZE], return_counts=True)
+    
+    for start in range(_CHUNK_SIZE, len(data), _CHUNK_SIZE):
+        chunk_values, chunk_counts = np.unique(
+            data[start:start + _CHUNK_SIZE], return_counts=True)
+        values, inverse = np.unique(np.concatenate([values, chunk_values]),
+                                    return_inverse=True)
+        merged = np.zeros(len(values), dtype=np.int64)
+        np.add.at(merged, inverse.ravel(),
+                  np.concatenate([counts, chunk_counts]))
+        counts = merged
+        
+    return values, counts
+
+
+def _removal_entropy(counts, n_labels, plogp, n_classes):
+    """
+    Vectorized information entropy in base e of a dataset after removing a
+    single observation, for each of the given counts of the removed value
+
+    Parameters
+    ----------
+    counts : ndarray
+        Count of the removed value in the dataset, one per candidate removal
+    n_labels : int
+        Number of observations in the dataset before removal
+    plogp : float
+        Sum of c * log(c) over the counts of all values in the dataset
+    n_classes : int
+        Number of distinct values in the dataset before removal
+
+    Returns
+    -------
+    ndarray of float
+        Entropy of the dataset resulting from each candidate removal
+    """
+    counts = np.asarray(counts, dtype=float)
+    n_labels = n_labels - 1
+    
+    if n_labels <= 1:
+        return np.zeros(len(counts))
+    
+    remaining = counts - 1
+    new_plogp = plogp - counts * np.log(counts)
+    new_plogp += remaining * np.log(np.where(remaining > 0, remaining, 1))
+    
+    ent = log(n_labels, e) - new_plogp / n_labels
+    ent[n_classes - (remaining == 0) <= 1] = 0
+    
+    return ent
 
 
 class EntropyProblem:
@@ -19,6 +151,22 @@ class EntropyProblem:
     categorical or numerical datasets and takes array or dataframe as 
     input
     
+    The problem keeps a count table of the data (value -> count) together
+    with the running sum of count * log(count), so the entropy of a
+    successor with one observation removed is updated in O(1) from its
+    parent instead of being recalculated over the whole dataset.
+    
+    All successors share the buffer of the input data, which may be an
+    np.memmap. Each problem only stores the sorted positions removed from
+    that buffer, and its data is materialized lazily on first access.
+    Pandas input is factorized once into integer codes, which serve as the
+    buffer, so nullable and categorical dtypes are supported and the index
+    is only used to map results back at the end.
+    
+    Continuous data can be discretized with a binner from
+    OutlierDetection.binning, in which case the count table holds the bin
+    counts and each value is treated as an observation of its bin
+    
     Parameters:
     ----------
     data : array-like
@@ -27,6 +175,24 @@ class EntropyProblem:
     size : int
         Number of neighbors to explore
         
+    random_state : None, int, SeedSequence or Generator
+        Source of randomness for the initial state of this problem and of
+        its successors. See check_random_state()
+        
+    search : str
+        'window' to consider the observations within size of a random
+        initial state as candidates for removal, or 'value' to consider
+        every distinct value in the data. Removing any occurrence of a
+        value yields the same entropy, so in 'value' mode each epoch costs
+        O(k) in the number of distinct values, independent of the data
+        size, and the first remaining occurrence of a value is removed
+        
+    binner : BaseBinner, optional
+        Binner used to discretize continuous data, such as
+        FixedWidthBinner or QuantileBinner. It is fitted in a single pass
+        over the data if it has not been fitted yet. The names of removed
+        outliers are then the left edges of their bins
+        
     
     Attributes:
     ----------
@@ -39,47 +205,386 @@ class EntropyProblem:
         Random seed to initialize successor selection from neighbors
     
     base : float
-        Information entropy of input data
+        Information entropy of input data. Computed lazily on first access
+        and cached until the data is reassigned
+        
+    removed : ndarray of int
+        Sorted positions in the input data removed as outliers
         
     """
     
-    def __init__(self, data, size=20, name=None):
-        self.data = data
+    def __init__(self, data, size=20, name=None, search='window',
+                 random_state=None, binner=None):
+        if search not in ('window', 'value'):
+            raise Exception("Search must be 'window' or 'value', got "
+                            "{}".format(search))
+            
         self.size = size
-        self.initial_state= np.random.choice(len(data))
         self.name = name
+        self.search = search
+        self._parent = None
+        self._position = None
+        self._stats = _new_stats()
+        self.random_state = check_random_state(random_state)
+        self.binner = binner
+        self.data = data
+        self.initial_state= self.random_state.integers(self._n)
+        
+        
+    @classmethod
+    def from_memmap(cls, filename, dtype, size=20, offset=0, shape=None,
+                    search='window', random_state=None, binner=None):
+        """
+        Create a problem over a binary file of raw values without loading
+        it into memory
+
+        Parameters
+        ----------
+        filename : str or path-like
+            File containing the values, as written by ndarray.tofile()
+        dtype : data-type
+            Data type of the values in the file
+        size : int
+            Number of neighbors to explore
+        offset : int
+            Offset in bytes of the first value in the file
+        shape : int, optional
+            Number of values to read. Defaults to the rest of the file
+        search : str
+            'window' or 'value'. See EntropyProblem
+        random_state : None, int, SeedSequence or Generator
+            See check_random_state()
+        binner : BaseBinner, optional
+            See EntropyProblem
+
+        Returns
+        -------
+        EntropyProblem
+        """
+        
+        data = np.memmap(filename, dtype=dtype, mode='r', offset=offset,
+                         shape=shape)
+        
+        return cls(data, size=size, search=search,
+                   random_state=random_state, binner=binner)
+        
+        
+    def restart(self, random_state=None):
+        """
+        Returns a copy of this problem with a new random initial state.
+        The data buffer and count table are shared with this problem rather
+        than rebuilt, so restarts are cheap
+
+        Parameters
+        ----------
+        random_state : None, int, SeedSequence or Generator
+            Source of randomness for the restart and its successors. None
+            spawns an independent stream from this problem's generator, so
+            restarts can run in parallel reproducibly
+
+        Returns
+        -------
+        EntropyProblem
+        """
+        
+        if self._parent is not None:
+            self._materialize()
+            
+        problem = copy.copy(self)
+        problem._stats = _new_stats()
+        
+        if random_state is None:
+            problem.random_state = self.random_state.spawn(1)[0]
+        else:
+            problem.random_state = check_random_state(random_state)
+            
+        problem.initial_state = problem.random_state.integers(self._n)
+        
+        return problem
+        
+        
+    @property
+    def data(self):
+        """Input data with all outliers removed so far. Materialized from
+           the shared buffer on first access"""
+        
+        if self._data is None:
+            self._data = self._materialize_data()
+            self._stats['bytes_copied'] += _nbytes(self._data)
+        return self._data
+    
+    
+    @data.setter
+    def data(self, data):
+        self._original = data
+        self._data = data
         self.__base = None
+        self._parent = None
+        self._position = None
+        self._pandas = _is_pandas(data)
+        self._prepare(data)
+        self._removed = np.empty(0, dtype=np.int64)
+        self._shift = self._removed
+        self._build_histogram()
+        self._root_counts = self._counts
         
         
     @property
-    def base(self):
-        """Calculate information entropy of dataset in base e and set as 
-           attribute"""
+    def original(self):
+        """Input data the problem was built from, with nothing removed"""
         
-        self.__base = self.calc_entropy()
-        return self.__base
+        return self._original
     
     
-    def calc_entropy(self):
-        """Calculate information entropy of dataset in base e"""
-        n_labels = len(self.data)
+    @property
+    def removed(self):
+        """Sorted positions in the input data removed as outliers"""
+        
+        if self._parent is not None:
+            self._materialize()
+        if self._removed is None:
+            self._removed = self._first_occurrences()
+        return self._removed
+        
+        
+    @property
+    def removed_labels(self):
+        """Index labels of the removed rows for pandas input, or the removed
+           positions for array input"""
+        
+        if self._pandas:
+            return self._original.index[self.removed]
+        return self.removed
+        
         
-        if n_labels <= 1:
-            return 0
+    def _prepare(self, data):
+        """Set up the shared buffer from the input data. For pandas input
+           the buffer holds the factorized codes and the distinct values"""
         
-        value, counts = np.unique(self.data, return_counts=True)
-        probs = counts/n_labels
-        n_classes = np.count_nonzero(probs)
+        if self.binner is not None and self._pandas:
+            self._source = self._column(data).to_numpy(dtype=float,
+                                                       na_value=np.nan)
+            self._encoded = False
+        elif self._pandas:
+            self._source, self._values = self._factorize(data)
+            self._encoded = True
+        else:
+            self._source = np.asarray(data).ravel()
+            self._encoded = False
+            
+            
+    @staticmethod
+    def _column(data):
+        """The single column of pandas input as a Series"""
         
-        if n_classes <= 1:
-            return 0
+        import pandas as pd
         
-        ent = 0.
+        if isinstance(data, pd.DataFrame):
+            if data.shape[1] != 1:
+                raise Exception('EntropyProblem takes 1D data. Got a '
+                                'DataFrame with {} columns'.format(
+                                    data.shape[1]))
+            data = data.iloc[:, 0]
+            
+        return data
         
-        for i in probs:
-            ent -= i * log(i, e)
         
-        return ent
+    @classmethod
+    def _factorize(cls, data):
+        """Integer codes and distinct values of a pandas column. Missing
+           values are kept as a value of their own"""
+        
+        import pandas as pd
+        
+        return pd.factorize(cls._column(data), use_na_sentinel=False)
+    
+    
+    def _encode(self, values):
+        """Index in the count table of each value of the buffer"""
+        
+        if self.binner is not None:
+            return self.binner.transform(values)
+        if self._encoded:
+            return values
+        return np.searchsorted(self._values, values)
+        
+        
+    def _build_histogram(self):
+        """Build the count table and running entropy terms from the data"""
+        
+        if self.binner is not None:
+            if not self.binner.is_fitted:
+                self.binner.fit(self._source, chunksize=_CHUNK_SIZE)
+                
+            self._values = self.binner.labels
+            self._counts = np.zeros(len(self._values), dtype=np.int64)
+            for start in range(0, len(self._source), _CHUNK_SIZE):
+                codes = self._encode(self._source[start:start + _CHUNK_SIZE])
+                self._counts += np.bincount(codes,
+                                            minlength=len(self._values))
+        elif self._encoded:
+            self._counts = np.bincount(self._source,
+                                       minlength=len(self._values))
+        else:
+            self._values, self._counts = _value_counts(self._source)
+            
+        self._n, self._n_classes, self._plogp = _histogram_terms(self._counts)
+        self._stats['histograms'] += 1
+        
+        
+    def _to_original(self, positions):
+        """Map positions in the current data to positions in the shared
+           buffer by skipping over the removed positions"""
+        
+        return positions + np.searchsorted(self._shift, positions,
+                                           side='right')
+    
+    
+    def _codes_at(self, positions):
+        """Index in the count table of the values at the given positions of
+           the current data"""
+        
+        return self._encode(self._source[self._to_original(positions)])
+        
+        
+    def _first_occurrences(self):
+        """Positions of the first occurrences of each value removed in
+           'value' search, found in one chunked pass over the buffer"""
+        
+        quota = self._root_counts - self._counts
+        codes = np.flatnonzero(quota)
+        remaining = quota[codes]
+        positions = [np.empty(0, dtype=np.int64)]
+        
+        for start in range(0, len(self._source), _CHUNK_SIZE):
+            if not remaining.any(): break
+            
+            chunk = self._encode(self._source[start:start + _CHUNK_SIZE])
+            for j, code in enumerate(codes):
+                if remaining[j]:
+                    hits = np.flatnonzero(chunk == code)[:remaining[j]]
+                    positions.append(hits + start)
+                    remaining[j] -= len(hits)
+                    
+        return np.sort(np.concatenate(positions))
+    
+    
+    def _successor(self, code, position, size, name):
+        """Create a successor with one occurrence of the value at code
+           removed, at the given position in 'window' search. Only the
+           running entropy terms are updated here; the removed positions
+           and counts of the successor are materialized lazily"""
+        
+        count = int(self._counts[code])
+        
+        successor = type(self).__new__(type(self))
+        successor.size = size
+        successor.name = name
+        successor.search = self.search
+        successor.random_state = self.random_state
+        successor._parent = self
+        successor._position = position
+        successor._code = code
+        successor._stats = self._stats
+        successor.__base = None
+        successor._original = self._original
+        successor._source = self._source
+        successor._data = None
+        successor._values = self._values
+        successor._encoded = self._encoded
+        successor._pandas = self._pandas
+        successor.binner = self.binner
+        successor._root_counts = self._root_counts
+        successor._removed = None
+        successor._shift = None
+        successor._counts = None
+        successor._n = self._n - 1
+        successor._n_classes = self._n_classes - (count == 1)
+        successor._plogp = self._plogp - _xlogx(count) + _xlogx(count - 1)
+        successor.initial_state = (self.random_state.integers(successor._n)
+                                   if successor._n else 0)
+        
+        return successor
+    
+    
+    def _materialize(self):
+        """Derive the removed positions and counts from the parent, and
+           release the reference to the parent"""
+        
+        parent, i = self._parent, self._position
+        
+        if self.search == 'window':
+            position = parent._to_original(i)
+            removed = parent.removed
+            
+            self._removed = np.insert(removed,
+                                      np.searchsorted(removed, position),
+                                      position)
+            self._shift = self._removed - np.arange(len(self._removed))
+            self._stats['bytes_copied'] += 2 * self._removed.nbytes
+            
+        self._counts = parent._counts.copy()
+        self._counts[self._code] -= 1
+        self._stats['bytes_copied'] += self._counts.nbytes
+        self._parent = None
+        
+        
+    def _materialize_data(self):
+        """Copy the input data with the removed positions dropped"""
+        
+        removed = self.removed
+        
+        if self._pandas:
+            keep = np.ones(len(self._source), dtype=bool)
+            keep[removed] = False
+            return self._original.iloc[keep].reset_index(drop=True)
+        
+        return np.delete(self._source, removed)
+        
+        
+    @property
+    def base(self):
+        """Calculate information entropy of dataset in base e and set as 
+           attribute. The value is cached after the first access"""
+        
+        if self.__base is None:
+            self.__base = self.calc_entropy()
+            self._stats['computations'] += 1
+        else:
+            self._stats['hits'] += 1
+            
+        return self.__base
+    
+    
+    def cache_info(self):
+        """
+        Report how often the entropy was served from cache versus computed,
+        how many full passes over the data built a count table, and how
+        many bytes were copied to materialize successors and their data.
+        The statistics are shared by a problem and all of its successors
+
+        Returns
+        -------
+        CacheInfo
+            Named tuple of (hits, computations, histograms, bytes_copied)
+        """
+        
+        return CacheInfo(**self._stats)
+    
+    
+    def calc_entropy(self):
+        """Calculate information entropy of dataset in base e from the 
+           count table, using H = log(n) - sum(c * log(c)) / n"""
+        
+        return _entropy(self._n, self._plogp, self._n_classes)
+    
+    
+    def entropy_terms(self):
+        """Number of observations, sum of c * log(c) and number of distinct
+           values of the count table, from which the entropy of each
+           removal is computed"""
+        
+        return self._n, self._plogp, self._n_classes
     
     
     def neighbors(self):
@@ -87,9 +592,9 @@ class EntropyProblem:
            successors"""
         
         
-        if self.size > len(self.data):
+        if self.size > self._n:
             raise Exception('Size is too larget for data set.'
-                            'Set a value <= {}'.format(len(self.data)))
+                            'Set a value <= {}'.format(self._n))
         
         # Set initial bounds of successor set
         min_neighbor = self.initial_state - self.size
@@ -101,53 +606,155 @@ class EntropyProblem:
         else:
             min_value = min_neighbor
             
-        if max_neighbor > len(self.data):
-            max_value = len(self.data)
+        if max_neighbor > self._n:
+            max_value = self._n
         else:
             max_value = max_neighbor
             
         return range(min_value, max_value)
     
     
+    def candidates(self):
+        """
+        Candidates for removal. In 'window' search these are the positions
+        in the neighborhood of the initial state, keeping only the first
+        position of each distinct value since removing any occurrence of a
+        value yields the same entropy. In 'value' search these are the
+        indices in the count table of all values still present
+
+        Returns
+        -------
+        ndarray of int
+            Candidates in ascending order
+        """
+        
+        if self._parent is not None:
+            self._materialize()
+            
+        if self.search == 'value':
+            return np.flatnonzero(self._counts)
+            
+        neighbors = self.neighbors()
+        positions = np.arange(neighbors.start, neighbors.stop)
+        _, first = np.unique(self._codes_at(positions), return_index=True)
+        
+        return positions[np.sort(first)]
+    
+    
+    def candidate_counts(self, candidates):
+        """Count of the value removed by each candidate. The entropy after a
+           removal is increasing in this count, so it orders candidates the
+           same way score_removals() does"""
+        
+        if self._parent is not None:
+            self._materialize()
+            
+        candidates = np.asarray(candidates)
+        
+        if self.search == 'value':
+            return self._counts[candidates]
+        
+        return self._counts[self._codes_at(candidates)]
+    
+    
+    def candidate_values(self, candidates):
+        """Value removed by each candidate"""
+        
+        if self._parent is not None:
+            self._materialize()
+            
+        candidates = np.asarray(candidates)
+        
+        if self.search == 'value':
+            return self._values[candidates]
+        
+        return self._values[self._codes_at(candidates)]
+    
+    
+    def score_removal(self, candidate):
+        """Information entropy resulting from removing a single candidate,
+           updated in O(1) from the count table without creating a
+           successor"""
+        
+        count = int(self.candidate_counts([candidate])[0])
+        
+        return _entropy(self._n - 1,
+                        self._plogp - _xlogx(count) + _xlogx(count - 1),
+                        self._n_classes - (count == 1))
+    
+    
+    def score_removals(self, positions=None):
+        """
+        Calculate the information entropy resulting from removing each of
+        the given candidates, in one vectorized pass over the count table
+
+        Parameters
+        ----------
+        positions : array-like of int, optional
+            Candidates to score. Defaults to the range from neighbors() in
+            'window' search and to all values in 'value' search
+
+        Returns
+        -------
+        ndarray of float
+            Entropy of the successor for each candidate
+        """
+        
+        if positions is None:
+            if self.search == 'value':
+                positions = self.candidates()
+            else:
+                neighbors = self.neighbors()
+                positions = np.arange(neighbors.start, neighbors.stop)
+                
+        counts = self.candidate_counts(positions)
+        
+        return _removal_entropy(counts, self._n, self._plogp, self._n_classes)
+    
+    
+    def remove(self, position):
+        """Returns the successor with the candidate removed: the observation
+           at position in 'window' search, or the first remaining
+           occurrence of the value at that index of the count table in
+           'value' search"""
+        
+        if self._parent is not None:
+            self._materialize()
+            
+        size = min(self.size, self._n - 1)
+        position = int(position)
+        
+        if self.search == 'value':
+            code, position = position, None
+        else:
+            code = int(self._codes_at(np.array([position]))[0])
+            
+        return self._successor(code, position, size=size,
+                               name=self._values[code])
+    
+    
     def get_successors(self):
         """
         Generates set of successor EntropyProblem instances from the 
         neighborhood of the initial state, each with a unique neighbor 
         designated as an outlier and removed. The new information entropy is 
-        recalculated as a property in each successor instance.
+        updated from the count table of this problem, so no data is copied
+        until a successor's data is accessed.
 
         Returns
         -------
         Generator object of EntropyProblem successors
 
         """
-    
-        exists = set()
         
-        for i in self.neighbors():
-            if isinstance(self.data, (pd.DataFrame, pd.Series)):
-                new_data = self.data.drop(index=i)
-                new_data = new_data.reset_index(drop=True)
-                value = self.data.loc[self.data.index==i].values.item()
-                
-            elif isinstance(self.data, np.ndarray):
-                new_data = np.delete(self.data, i)
-                value = self.data[i]
-                
-            if self.size <= len(new_data):
-                size = self.size
-            else:
-                size = len(new_data)
-                
-            if value not in exists:
-                yield EntropyProblem(new_data, size=size, name=value)
-                exists.add(value)
+        for i in self.candidates():
+            yield self.remove(i)
                 
                 
     def select_successor(self):
         """Returns a single successor at random from neighbors"""
         
-        all_successors = self.get_successors()
-        successor = np.random.choice(list(all_successors))
+        all_successors = list(self.get_successors())
+        successor = all_successors[self.random_state.integers(len(all_successors))]
         
-        return successor
\ No newline at end of file
+        return successor
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+from OutlierDetection.ent import EntropyProblem
+
+"""Multivariate outlier detection by minimizing the joint information
+   entropy of several categorical columns"""
+
+
+# Largest product of cardinalities encoded before the keys are compacted,
+# so that the mixed-radix keys never overflow int64
+_MAX_RADIX = 1 << 62
+
+
+def _joint_key(codes, cardinalities):
+    """
+    Combine per-column integer codes into one integer key per row using a
+    mixed-radix encoding. The keys are compacted with pd.factorize whenever
+    the next column would overflow int64, so distinct rows always get
+    distinct keys
+
+    Parameters
+    ----------
+    codes : list of ndarray of int
+        Codes of each column, all of the same length
+    cardinalities : list of int
+        Number of distinct codes of each column
+
+    Returns
+    -------
+    ndarray of int64
+        Key of each row
+    """
+
+    key = np.zeros(len(codes[0]), dtype=np.int64)
+    radix = 1
+
+    for column, cardinality in zip(codes, cardinalities):
+        if radix * cardinality >= _MAX_RADIX:
+            key, uniques = pd.factorize(key)
+            radix = len(uniques)
+
+        key = key * cardinality + column
+        radix *= cardinality
+
+    return key
+
+
+class JointEntropyProblem(EntropyProblem):
+    """
+    Calculate the joint information entropy of several categorical columns.
+    Each row is an observation, and rows with the same combination of
+    values belong to the same class. The columns are factorized and their
+    codes combined into a compact integer key per row with vectorized
+    operations, so the problem keeps a single joint count table and plugs
+    into the same optimizers as EntropyProblem
+
+    Parameters:
+    ----------
+    data : pd.DataFrame or 2D array-like
+        Input data, one column per variable
+
+    size : int
+        Number of neighbors to explore
+
+    search : str
+        'window' or 'value'. See EntropyProblem
+
+    random_state : None, int, SeedSequence or Generator
+        See EntropyProblem
+
+
+    Attributes:
+    ----------
+    name : tuple
+        Row values removed to create this problem from its parent. None for
+        the initial problem
+
+    """
+
+    def __init__(self, data, size=20, name=None, search='window',
+                 random_state=None):
+        super().__init__(data, size=size, name=name, search=search,
+                         random_state=random_state)
+
+
+    def _prepare(self, data):
+        """Set up the buffer of joint codes and the row value of each
+           distinct joint code"""
+
+        if isinstance(data, pd.Series):
+            data = data.to_frame()
+
+        if isinstance(data, pd.DataFrame):
+            columns = [data.iloc[:, j] for j in range(data.shape[1])]
+        else:
+            data = np.asarray(data)
+            if data.ndim == 1:
+                data = data[:, None]
+            columns = [data[:, j] for j in range(data.shape[1])]
+
+        factorized = [pd.factorize(column, use_na_sentinel=False)
+                      for column in columns]
+
+        key = _joint_key([codes for codes, _ in factorized],
+                         [len(uniques) for _, uniques in factorized])
+        codes, _ = pd.factorize(key)
+
+        # codes are numbered in order of first appearance, so the first row
+        # of each code is where the running maximum of the codes increases
+        first = np.flatnonzero(np.r_[True, codes[1:] >
+                                     np.maximum.accumulate(codes)[:-1]])
+
+        values = np.empty(len(first), dtype=object)
+        values[:] = list(zip(*(np.asarray(uniques, dtype=object)[
+            column_codes[first]] for column_codes, uniques in factorized)))
+
+        self._source = codes
+        self._values = values
+        self._encoded = True
+
+
+    def _materialize_data(self):
+        """Copy the input rows with the removed rows dropped"""
+
+        if self._pandas:
+            return super()._materialize_data()
+
+        return np.delete(np.asarray(self._original), self.removed, axis=0)
@@ -7,24 +7,299 @@ Created on Mon Mar 15 15:33:04 2021
 """
 
 
+import heapq
+import time
 import numpy as np
 import math
-import seaborn as sns
-import matplotlib.pyplot as plt
 
 from abc import ABCMeta, abstractmethod
-from matplotlib.ticker import MaxNLocator
-from itertools import chain, count
+from concurrent.futures import ThreadPoolExecutor
+
+from OutlierDetection.ent import _removal_entropy, check_random_state
 
 """Search optimization algorithms to solve the EntropyProblem for
    outlier detection using entropy minimization"""
 
+def _smallest(scores, k):
+    """Indices of the k smallest scores, ordered from largest to smallest
+       so the best is last. Selects in O(n) with np.partition and breaks
+       ties by lowest index, so the result is deterministic"""
+    
+    if k < len(scores):
+        threshold = np.partition(scores, k - 1)[k - 1]
+        below = np.flatnonzero(scores < threshold)
+        ties = np.flatnonzero(scores == threshold)[:k - len(below)]
+        best = np.concatenate([below, ties])
+    else:
+        best = np.arange(len(scores))
+        
+    return best[np.lexsort((best, scores[best]))][::-1]
+
+
+def _exhausted(problem):
+    """Whether no removal can change the entropy of a problem. Entropy 0
+       means at most one observation or one distinct value is left, and
+       removing from it leaves the entropy at 0"""
+    
+    return problem.base == 0
+
+
+class _Budget:
+    """Tracks the wall time and number of entropy evaluations of a search
+       against optional limits"""
+    
+    def __init__(self, max_time=None, max_evals=None):
+        self.max_time = max_time
+        self.max_evals = max_evals
+        self.start = time.perf_counter()
+        self.evals = 0
+        
+        
+    def exhausted(self):
+        if self.max_evals is not None and self.evals >= self.max_evals:
+            return True
+        if self.max_time is not None:
+            return time.perf_counter() - self.start >= self.max_time
+        return False
+
+
+def _score_counts(task):
+    """Entropy of removing each candidate of a beam member, from the counts
+       of the values the candidates remove and the entropy terms of the
+       member. This is all a worker needs, so the data buffer of the
+       problem is never sent to it"""
+    
+    counts, n_labels, plogp, n_classes = task
+    return _removal_entropy(counts, n_labels, plogp, n_classes)
+
+
+class SearchResult:
+    """
+    Compact result of a search, with storage proportional to the number of
+    removals. The input data is referenced rather than copied, and the mask
+    and filtered data are only computed when first accessed
+    
+    Parameters:
+    ----------
+    removed : ndarray of int or None
+        Sorted positions of the removed rows in the input data. None for
+        problems without row positions, such as stream.HistogramProblem
+        
+    values : ndarray
+        Value removed at each step, in order. A value removed several times
+        appears once per removal
+        
+    entropy : ndarray of float
+        Entropy before the search, followed by the entropy after each step
+        
+    original : array-like, optional
+        Input data the removed positions refer to
+        
+    """
+    
+    def __init__(self, removed, values, entropy, original=None):
+        self.removed = removed
+        self.values = values
+        self.entropy = entropy
+        self.original = original
+        self._mask = None
+        
+        
+    @classmethod
+    def from_search(cls, problem, solution, trail):
+        """
+        Build the result of a search
+        
+        Parameters
+        ----------
+        problem : Problem
+            Initial state of the search
+        solution : Problem
+            Solution state returned by the search
+        trail : list of tuple
+            Name and entropy of each step leading to the solution
+            
+        Returns
+        -------
+        SearchResult
+        """
+        
+        original = getattr(problem, 'original', None)
+        
+        removed = getattr(solution, 'removed', None)
+        if isinstance(removed, np.ndarray):
+            small = len(removed) == 0 or removed[-1] < 2**31
+            removed = removed.astype(np.int32 if small else np.int64)
+        else:
+            removed = None
+            
+        names = [name for name, _ in trail]
+        values = np.asarray(names) if names else np.empty(0)
+        if values.ndim != 1:
+            values = np.empty(len(names), dtype=object)
+            values[:] = names
+            
+        entropy = np.array([problem.base] + [h for _, h in trail])
+        
+        return cls(removed, values, entropy, original=original)
+    
+    
+    def __len__(self):
+        """Number of removals"""
+        
+        return len(self.values)
+    
+    
+    @property
+    def mask(self):
+        """Boolean mask over the input data, False for removed rows"""
+        
+        if self._mask is None:
+            if self.original is None or self.removed is None:
+                raise Exception('Result has no row positions to mask')
+                
+            self._mask = np.ones(len(self.original), dtype=bool)
+            self._mask[self.removed] = False
+            
+        return self._mask
+    
+    
+    @property
+    def data(self):
+        """Input data with the removed rows dropped, computed on access.
+           pandas input keeps its index"""
+        
+        if hasattr(self.original, 'iloc'):
+            return self.original.iloc[self.mask]
+        
+        return np.asarray(self.original)[self.mask]
+
+
 class BaseOptimizer(metaclass=ABCMeta):
     """Abstract base class for Optimizer. This class is not meant to be
-       instaniated directly"""
+       instaniated directly
+       
+    Attributes:
+    -----------
+    result : SearchResult
+        Removed positions, values removed at each step and entropy
+        trajectory of the last search
+        
+    history : list of dict
+        Per-epoch statistics of the last search, recorded only after
+        enable_instrumentation() is called. Each record holds the epoch,
+        its wall time in seconds, the number of entropy evaluations and
+        successors generated, the bytes copied to materialize successors
+        and their data, and the entropy of the resulting state
+       
+    """
+    
+    HISTORY_COLUMNS = ['epoch', 'wall_time', 'evaluations', 'successors',
+                       'bytes_copied', 'entropy']
+    
+    instrumented = False
+    callback = None
     
     def __init__(self):
         self.outliers = {}
+        self.result = None
+        self.history = []
+        
+        
+    def enable_instrumentation(self, callback=None):
+        """
+        Record per-epoch statistics in self.history during each search
+
+        Parameters
+        ----------
+        callback : callable, optional
+            Called with each record as soon as its epoch completes, e.g. to
+            forward it to a metrics system
+
+        Returns
+        -------
+        self
+        """
+        
+        self.instrumented = True
+        self.callback = callback
+        
+        return self
+    
+    
+    def disable_instrumentation(self):
+        """Stop recording per-epoch statistics"""
+        
+        self.instrumented = False
+        self.callback = None
+        
+        return self
+    
+    
+    def history_frame(self):
+        """Per-epoch statistics of the last search as a DataFrame"""
+        
+        import pandas as pd
+        
+        return pd.DataFrame(getattr(self, 'history', []),
+                            columns=self.HISTORY_COLUMNS)
+    
+    
+    def _reset(self):
+        """Clears the results of the previous search"""
+        
+        self.outliers = {}
+        self.result = None
+        self.history = []
+        self._trail = []
+        
+        
+    def _step(self, problem):
+        """Records a problem as the next step of the search"""
+        
+        self.outliers[problem.name] = problem.base
+        self._trail.append((problem.name, problem.base))
+        
+        
+    def _finish(self, problem, solution):
+        """Stores the result of a search from problem to solution and
+           returns the solution"""
+        
+        self.result = SearchResult.from_search(problem, solution,
+                                               self._trail)
+        
+        return solution
+        
+        
+    def _mark(self, problem):
+        """Start time and bytes copied so far at the start of an epoch, or
+           None when instrumentation is disabled"""
+        
+        if not self.instrumented:
+            return None
+        
+        return time.perf_counter(), problem.cache_info().bytes_copied
+    
+    
+    def _record(self, mark, problem, evaluations, successors):
+        """Records the statistics of an epoch started at mark"""
+        
+        if mark is None:
+            return
+        
+        start, bytes_copied = mark
+        record = {'epoch': len(self.history),
+                  'wall_time': time.perf_counter() - start,
+                  'evaluations': evaluations,
+                  'successors': successors,
+                  'bytes_copied': (problem.cache_info().bytes_copied
+                                   - bytes_copied),
+                  'entropy': problem.base}
+        
+        self.history.append(record)
+        
+        if self.callback is not None:
+            self.callback(record)
    
     
     @abstractmethod
@@ -36,8 +311,11 @@ class BaseOptimizer(metaclass=ABCMeta):
         problem : EntropyProblem or related Problem
             Optimization problem instance. Contains input data and calculates
             information entropy as stored in a property called 'base'. Must
-            also contain a 'get_successors()' method, which generates all of
-            the successors from the neighborhood of the initial/current state
+            also contain a 'candidates()' method, which returns the candidate
+            removals in the neighborhood of the initial/current state, a
+            'score_removals()' method, which returns an array with the
+            entropy resulting from each candidate, and a 'remove()' method,
+            which returns the successor for a single candidate
 
         Returns
         -------
@@ -58,8 +336,11 @@ class BaseOptimizer(metaclass=ABCMeta):
         problem : EntropyProblem or related Problem
             Optimization problem instance. Contains input data and calculates
             information entropy as stored in a property called 'base'. Must
-            also contain a 'get_successors()' method, which generates all of
-            the successors from the neighborhood of the initial/current state
+            also contain a 'candidates()' method, which returns the candidate
+            removals in the neighborhood of the initial/current state, a
+            'score_removals()' method, which returns an array with the
+            entropy resulting from each candidate, and a 'remove()' method,
+            which returns the successor for a single candidate
 
         Returns
         -------
@@ -70,34 +351,36 @@ class BaseOptimizer(metaclass=ABCMeta):
         pass
     
     
+    def _seed(self, problem):
+        """Restarts the problem from the optimizer's random_state, if set,
+           so that a run only depends on the data and the seed"""
+        
+        random_state = getattr(self, 'random_state', None)
+        
+        if random_state is None:
+            return problem
+        
+        return problem.restart(random_state=random_state)
+    
+    
     def _check_is_solved(self):
         """Checks if min_solve or max_solve have been called"""
         
-        if any(self.outliers) == False:
+        if getattr(self, 'result', None) is None or len(self.result) == 0:
             raise Exception('No outliers detected! Has solver been fit?')
             
         return self
     
     
     def plot_iter(self):
-        """Generates a plot of data entropy following each iteration"""
+        """Generates a plot of data entropy following each iteration. The
+           plotting libraries are imported on the first call"""
         
         self._check_is_solved()
         
-        max_iter = len(self.outliers.values())
+        from OutlierDetection.plotting import plot_entropy
         
-        ax = plt.figure().gca()
-        sns.lineplot(x=range(1, max_iter+1),
-                     y=list(self.outliers.values()),
-                     drawstyle='steps-pre',
-                     ax=ax
-                    )
-        plt.xlabel('Iterations')
-        plt.ylabel('Entropy')
-        
-        ax.xaxis.set_major_locator(MaxNLocator(integer=True))
-        
-        plt.show()
+        plot_entropy(self.result.entropy[1:])
         
         
 
@@ -111,16 +394,28 @@ class HillClimber(BaseOptimizer):
     epochs : int
         Max number of iterations before terminating
         
+    random_state : None, int, SeedSequence or Generator
+        If set, the problem is restarted from a state drawn from this seed
+        before solving, so runs are reproducible however the problem was
+        seeded. See ent.check_random_state()
+        
     Attributes:
     -----------
     outliers : dict
         Dictionary of outliers removed with each iteration. Stores data
-        value as the key and the entropy of the resulting dataset as the value
+        value as the key and the entropy of the resulting dataset as the value.
+        A value removed more than once keeps only its last entry, so result
+        holds the full trajectory
+        
+    result : SearchResult
+        Removed positions, values removed at each step and entropy
+        trajectory of the last search
     
     """
     
-    def __init__(self, epochs=20):
+    def __init__(self, epochs=20, random_state=None):
         self.epochs = epochs
+        self.random_state = random_state
         
         
     def min_solve(self, problem):
@@ -128,17 +423,7 @@ class HillClimber(BaseOptimizer):
         Optimize to minimize information entropy in a Problem        
         """
         
-        self.outliers = {}
-        
-        for _ in range(self.epochs):
-            neighbor = min(problem.get_successors(), key=lambda x: x.base)
-            
-            if neighbor.base > problem.base: break
-            problem = neighbor
-            
-            self.outliers[problem.name] = problem.base
-            
-        return problem
+        return self._solve(problem, 1)
     
     
     def max_solve(self, problem):
@@ -146,16 +431,35 @@ class HillClimber(BaseOptimizer):
         Optimize to maximize information entropy in a Problem
         """
         
+        return self._solve(problem, -1)
+    
+    
+    def _solve(self, problem, sign):
+        """Climbs towards the lowest sign * entropy"""
+        
+        self._reset()
+        problem = initial = self._seed(problem)
         
         for _ in range(self.epochs):
-            neighbor = min(problem.get_successors(), key=lambda x: x.base)
+            if _exhausted(problem): break
+            
+            mark = self._mark(problem)
+            
+            candidates = problem.candidates()
+            if len(candidates) == 0: break
+            
+            scores = sign * problem.score_removals(candidates)
+            best = np.argmin(scores)
             
-            if neighbor.base < problem.base: break
-            problem = neighbor
+            if scores[best] > sign * problem.base:
+                self._record(mark, problem, len(scores), 0)
+                break
+            problem = problem.remove(candidates[best])
             
-            self.outliers[problem.name] = problem.base
+            self._step(problem)
+            self._record(mark, problem, len(scores), 1)
             
-        return problem
+        return self._finish(initial, problem)
     
     
 class LocalBeamSearch(BaseOptimizer):
@@ -171,49 +475,439 @@ class LocalBeamSearch(BaseOptimizer):
         
     beam_width : int
         Number of samples to maintain during search
+        
+    n_jobs : int
+        Number of threads used to score the neighborhoods of the beam
+        members in parallel when no executor is given
+        
+    executor : concurrent.futures.Executor, optional
+        Executor used to score the beam members in parallel. The candidates
+        of each member and the counts of the values they remove are found
+        in this process, and only those counts and the member's entropy
+        terms are sent to the executor, so a process pool never receives
+        the data. Results are the same for any executor.
+        
+        Scoring a member is a single vectorized pass over its candidates,
+        so with window search the overhead of the tasks outweighs the work
+        and serial scoring, the default, is fastest
+        
+    random_state : None, int, SeedSequence or Generator
+        If set, the problem is restarted from a state drawn from this seed
+        before solving. See HillClimber
        
     """
        
-    def __init__(self, epochs=20, beam_width=5):
+    def __init__(self, epochs=20, beam_width=5, n_jobs=1, executor=None,
+                 random_state=None):
         self.epochs = epochs
         self.beam_width = beam_width
+        self.n_jobs = n_jobs
+        self.executor = executor
+        self.random_state = random_state
         
+        
+    def _expand(self, beam, executor=None):
+        """Scores the candidate removals of every beam member in one array.
+           Returns the beam member index, candidate and entropy of each
+           removal over the union of all neighborhoods"""
+        
+        candidates = [member.candidates() for member in beam]
+        
+        if executor is None:
+            scores = [member.score_removals(node_candidates)
+                      for member, node_candidates in zip(beam, candidates)]
+        else:
+            tasks = [(member.candidate_counts(node_candidates),)
+                     + member.entropy_terms()
+                     for member, node_candidates in zip(beam, candidates)]
+            scores = list(executor.map(_score_counts, tasks))
+            
+        members = [np.full(len(node_candidates), i)
+                   for i, node_candidates in enumerate(candidates)]
+            
+        return (np.concatenate(members), np.concatenate(candidates),
+                np.concatenate(scores))
     
-    def min_solve(self, problem):
+    
+    def _solve(self, problem, sign):
+        """Runs the beam search, keeping the successors with the lowest
+           sign * entropy"""
         
-        self.outliers = {}
+        self._reset()
+        problem = self._seed(problem)
         
-        beam = [problem]
+        if self.executor is None and self.n_jobs > 1:
+            with ThreadPoolExecutor(self.n_jobs) as executor:
+                return self._finish(problem,
+                                    self._search(problem, sign, executor))
+            
+        return self._finish(problem,
+                            self._search(problem, sign, self.executor))
+    
+    
+    def _search(self, problem, sign, executor):
+        
+        # each member keeps the trail of its own lineage, since the best
+        # successor of an epoch need not descend from the previous best
+        beam, trails = [problem], [[]]
         for t in range(self.epochs):
+            # the best member is last. At entropy 0 it is a minimum, or
+            # every member is exhausted when maximizing
+            if _exhausted(beam[-1]): break
+            
+            mark = self._mark(problem)
             
-            # union all neighbors
-            neighborhood = chain(*(n.get_successors() for n in beam))
+            # score the union of all neighbors
+            members, candidates, scores = self._expand(beam, executor)
+            if len(scores) == 0: break
             
-            beam = sorted(neighborhood,
-                          key=lambda x: x.base,
-                          reverse=True)[-self.beam_width:]
+            # k best entropies, ordered so the best successor is last
+            best = _smallest(sign * scores, self.beam_width)
             
-            if all([node.base > problem.base for node in beam]): break
+            if np.all(sign * scores[best] > sign * problem.base):
+                self._record(mark, beam[-1], len(scores), 0)
+                break
             
-            self.outliers[beam[-1].name] = beam[-1].base
+            beam = [beam[members[i]].remove(candidates[i]) for i in best]
+            trails = [trails[members[i]] + [(member.name, member.base)]
+                      for i, member in zip(best, beam)]
             
+            self._record(mark, beam[-1], len(scores), len(beam))
+            
+        self._trail = trails[-1]
+        self.outliers = dict(self._trail)
+        
         return beam[-1]
     
     
+    def min_solve(self, problem):
+        
+        return self._solve(problem, 1)
+    
+    
     def max_solve(self, problem):
         
-        self.outliers = {}
+        return self._solve(problem, -1)
+
+    
+    
+class GreedyValueSearch(BaseOptimizer):
+    """
+    Greedy removal of whole values using a priority queue of candidate
+    values keyed on their count. Removing one occurrence of a value lowers
+    the entropy more the rarer the value is, so the queue orders the
+    candidates by entropy gain. Only the entry of the removed value changes
+    after each removal, and it is updated in place, so each epoch costs
+    O(log k) in the number of distinct values after an O(k) build.
+    
+    Requires a problem whose candidates are distinct values, such as
+    EntropyProblem with search='value' or HistogramProblem, and raises
+    for a problem in 'window' search
+    
+    Parameters:
+    ----------
+    epochs : int
+        Max number of iterations before terminating
+    
+    """
+    
+    def __init__(self, epochs=20):
+        self.epochs = epochs
         
-        beam = [problem]
-        for t in range(self.epochs):
+        
+    def _solve(self, problem, sign):
+        """Removes the value at the top of the queue while doing so lowers
+           sign * entropy"""
+        
+        # window candidates are positions, which go stale after a removal
+        if getattr(problem, 'search', 'value') != 'value':
+            raise Exception("GreedyValueSearch requires a problem whose "
+                            "candidates are values, such as EntropyProblem "
+                            "with search='value'. Got search={!r}".format(
+                                problem.search))
+            
+        self._reset()
+        initial = problem
+        
+        candidates = problem.candidates()
+        counts = problem.candidate_counts(candidates)
+        queue = list(zip((sign * counts).tolist(), candidates.tolist()))
+        heapq.heapify(queue)
+        
+        for _ in range(self.epochs):
+            if not queue or _exhausted(problem): break
+            
+            mark = self._mark(problem)
+            
+            key, candidate = queue[0]
+            score = problem.score_removals([candidate])[0]
+            
+            if sign * score > sign * problem.base:
+                self._record(mark, problem, 1, 0)
+                break
+            problem = problem.remove(candidate)
+            
+            remaining = sign * key - 1
+            if remaining > 0:
+                heapq.heapreplace(queue, (sign * remaining, candidate))
+            else:
+                heapq.heappop(queue)
+                
+            self._step(problem)
+            self._record(mark, problem, 1, 1)
+            
+        return self._finish(initial, problem)
+    
+    
+    def min_solve(self, problem):
+        
+        return self._solve(problem, 1)
+    
+    
+    def max_solve(self, problem):
+        
+        return self._solve(problem, -1)
+
+    
+    
+class SimulatedAnnealing(BaseOptimizer):
+    """
+    Simulated annealing search for a low entropy state. Each epoch draws a
+    random candidate removal and scores it with the problem's O(1)
+    score_removal(), without creating a successor. Improving removals are
+    always accepted, and worsening removals with probability
+    exp(-delta / temperature), so the search can escape the local minima
+    where HillClimber stalls. The best state visited is returned
+    
+    Parameters:
+    ----------
+    epochs : int
+        Max number of candidate moves to evaluate
+        
+    initial_temp : float, optional
+        Starting temperature. Defaults to the mean absolute entropy change
+        over the candidates of the initial problem
+        
+    cooling : float
+        Factor applied to the temperature after each epoch
+        
+    max_time : float, optional
+        Wall time budget in seconds
+        
+    max_evals : int, optional
+        Budget of entropy evaluations
+        
+    random_state : None, int, SeedSequence or Generator
+        Source of randomness for the moves and the acceptance test. If set,
+        the problem is also restarted from this seed. See HillClimber
+        
+    Attributes:
+    -----------
+    outliers : dict
+        Outliers removed on the way to the best state, with the entropy of
+        the resulting dataset. See result for the full trajectory
+        
+    evaluations : int
+        Number of entropy evaluations in the last search
+    
+    """
+    
+    def __init__(self, epochs=1000, initial_temp=None, cooling=0.99,
+                 max_time=None, max_evals=None, random_state=None):
+        self.epochs = epochs
+        self.initial_temp = initial_temp
+        self.cooling = cooling
+        self.max_time = max_time
+        self.max_evals = max_evals
+        self.random_state = random_state
+        
+        
+    def _solve(self, problem, sign):
+        """Anneals towards the lowest sign * entropy"""
+        
+        self._reset()
+        problem = self._seed(problem)
+        
+        rng = check_random_state(self.random_state)
+        budget = _Budget(self.max_time, self.max_evals)
+        
+        temp = self.initial_temp
+        if temp is None:
+            temp = np.mean(np.abs(problem.score_removals(problem.candidates())
+                                  - problem.base))
+        
+        current = best = problem
+        trail, best_step = [], 0
+        
+        # the candidates only change when a move is accepted
+        candidates = None
+        
+        for _ in range(self.epochs):
+            if budget.exhausted() or _exhausted(current): break
+            
+            mark = self._mark(current)
+            
+            if candidates is None:
+                candidates = current.candidates()
+                if len(candidates) == 0: break
+            
+            candidate = candidates[rng.integers(len(candidates))]
+            score = current.score_removal(candidate)
+            budget.evals += 1
+            
+            delta = sign * (score - current.base)
+            accept = delta <= 0 or (temp > 0 and
+                                    rng.random() < math.exp(-delta / temp))
+            if accept:
+                current = current.remove(candidate)
+                candidates = None
+                trail.append((current.name, current.base))
+                
+                if sign * current.base < sign * best.base:
+                    best, best_step = current, len(trail)
+                    
+            self._record(mark, current, 1, int(accept))
+            temp *= self.cooling
+            
+        self._trail = trail[:best_step]
+        self.outliers = dict(self._trail)
+        self.evaluations = budget.evals
+        
+        return self._finish(problem, best)
+    
+    
+    def min_solve(self, problem):
+        
+        return self._solve(problem, 1)
+    
+    
+    def max_solve(self, problem):
+        
+        return self._solve(problem, -1)
+    
+    
+class TabuSearch(BaseOptimizer):
+    """
+    Tabu search for a low entropy state. Each epoch scores the candidate
+    removals in one vectorized score_removals() pass and takes the best
+    one whose value is not tabu, even if it is worse than
+    the current state. Values removed in the last tabu_size epochs are
+    tabu, unless removing them would reach a new best state. The best
+    state visited is returned
+    
+    Parameters:
+    ----------
+    epochs : int
+        Max number of iterations before terminating
+        
+    tabu_size : int
+        Number of recently removed values that may not be removed again
+        
+    n_samples : int, optional
+        Number of candidates sampled and scored per epoch. Defaults to all
+        candidates
+        
+    max_time : float, optional
+        Wall time budget in seconds, checked once per epoch
+        
+    max_evals : int, optional
+        Budget of entropy evaluations. The candidates of the last epoch are
+        cut down to the evaluations left
+        
+    random_state : None, int, SeedSequence or Generator
+        Source of randomness for sampling candidates. If set, the problem
+        is also restarted from this seed. See HillClimber
+        
+    Attributes:
+    -----------
+    outliers : dict
+        Outliers removed on the way to the best state, with the entropy of
+        the resulting dataset. See result for the full trajectory
+        
+    evaluations : int
+        Number of entropy evaluations in the last search
+    
+    """
+    
+    def __init__(self, epochs=100, tabu_size=5, n_samples=None,
+                 max_time=None, max_evals=None, random_state=None):
+        self.epochs = epochs
+        self.tabu_size = tabu_size
+        self.n_samples = n_samples
+        self.max_time = max_time
+        self.max_evals = max_evals
+        self.random_state = random_state
+        
+        
+    def _solve(self, problem, sign):
+        """Runs the tabu search towards the lowest sign * entropy"""
+        
+        self._reset()
+        problem = self._seed(problem)
+        
+        rng = check_random_state(self.random_state)
+        budget = _Budget(self.max_time, self.max_evals)
+        
+        current = best = problem
+        trail, best_step = [], 0
+        tabu = []
+        
+        for _ in range(self.epochs):
+            if budget.exhausted() or _exhausted(current): break
+            
+            mark = self._mark(current)
             
-            # union all neighbors
-            neighborhood = chain(*(n.get_successors for n in beam))
+            candidates = current.candidates()
+            if self.n_samples is not None and self.n_samples < len(candidates):
+                candidates = rng.choice(candidates, size=self.n_samples,
+                                        replace=False)
+            if self.max_evals is not None:
+                candidates = candidates[:self.max_evals - budget.evals]
+            if len(candidates) == 0: break
+                
+            scores = sign * current.score_removals(candidates)
+            budget.evals += len(candidates)
             
-            beam = sorted(neighborhood, key=lambda x: x.base)[-self.beam_width:]
+            # each candidate removes a different value, so at most tabu_size
+            # of them are tabu and the best allowed move is among the
+            # tabu_size + 1 best scores
+            order = _smallest(scores, len(tabu) + 1)[::-1]
+            values = current.candidate_values(candidates[order])
+            move = None
             
-            if all([node.base < problem.base for node in beam]): break
+            for i, value in zip(order, values):
+                if value not in tabu or scores[i] < sign * best.base:
+                    move = candidates[i]
+                    break
+                    
+            if move is None:
+                self._record(mark, current, len(candidates), 0)
+                break
             
-            self.outliers[beam[-1].name] = beam[-1].base
+            current = current.remove(move)
+            trail.append((current.name, current.base))
             
-        return beam[-1]
\ No newline at end of file
+            tabu.append(current.name)
+            if len(tabu) > self.tabu_size:
+                tabu.pop(0)
+                
+            if sign * current.base < sign * best.base:
+                best, best_step = current, len(trail)
+                
+            self._record(mark, current, len(candidates), 1)
+            
+        self._trail = trail[:best_step]
+        self.outliers = dict(self._trail)
+        self.evaluations = budget.evals
+        
+        return self._finish(problem, best)
+    
+    
+    def min_solve(self, problem):
+        
+        return self._solve(problem, 1)
+    
+    
+    def max_solve(self, problem):
+        
+        return self._solve(problem, -1)
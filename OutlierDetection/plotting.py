@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import seaborn as sns
+import matplotlib.pyplot as plt
+from matplotlib.ticker import MaxNLocator
+
+"""Optional plotting helpers. Kept out of the optimizers so that importing
+   them does not load matplotlib and seaborn, which are only imported the
+   first time a plot is requested"""
+
+
+def plot_entropy(entropies, ax=None, show=True):
+    """
+    Step plot of data entropy following each iteration
+
+    Parameters
+    ----------
+    entropies : array-like of float
+        Entropy after each iteration
+    ax : matplotlib Axes, optional
+        Axes to draw on. A new figure is created if not given
+    show : bool
+        Call plt.show() once the plot is drawn
+
+    Returns
+    -------
+    matplotlib Axes
+    """
+
+    if ax is None:
+        ax = plt.figure().gca()
+
+    sns.lineplot(x=range(1, len(entropies) + 1),
+                 y=list(entropies),
+                 drawstyle='steps-pre',
+                 ax=ax
+                )
+    ax.set_xlabel('Iterations')
+    ax.set_ylabel('Entropy')
+
+    ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+
+    if show:
+        plt.show()
+
+    return ax
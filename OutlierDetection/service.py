@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+"""Long-running outlier detection service. Requests are JSON lines read from
+   stdin or a Unix socket, and results are written back as JSON lines as soon
+   as each column is solved. Columns are solved in a pool of worker processes
+   that is started and warmed up once, and small columns are micro-batched so
+   that a single round trip to a worker solves several of them
+
+   Request:
+       {"id": 1, "columns": {"a": [...], "b": [...]}, "solver": "HillClimber",
+        "params": {"epochs": 20}, "size": 20, "search": "window",
+        "maximize": false, "random_state": 0}
+
+   "data": [...] can be given instead of "columns" for a single column. Each
+   column gets a response line
+
+       {"id": 1, "column": "a", "removed": [...], "entropy": ...,
+        "initial_entropy": ..., "entropies": [...], "wall_time": ...}
+
+   or {"id": 1, "column": "a", "error": "..."}, in the order the columns
+   finish, followed by {"id": 1, "done": true} once all are written. A
+   request that cannot be parsed gets {"id": 1, "error": "..."} and the
+   done line
+
+   Usage:
+       python -m OutlierDetection.service < requests.jsonl
+       python -m OutlierDetection.service --socket /tmp/outliers.sock
+"""
+
+
+SOLVERS = ('HillClimber', 'LocalBeamSearch', 'GreedyValueSearch',
+           'SimulatedAnnealing', 'TabuSearch')
+
+
+def _rows(data):
+    """Number of rows of a queued column, counted as 1 if it has no
+       length, so that bad input is left for the worker to reject"""
+
+    try:
+        return len(data)
+    except TypeError:
+        return 1
+
+
+def _error(error):
+    return {'error': '{}: {}'.format(type(error).__name__, error)}
+
+
+def _warm_up():
+    """Worker initializer. Imports the solvers and runs a tiny search so
+       that the first request does not pay for imports and first calls"""
+
+    from OutlierDetection.ent import EntropyProblem
+    from OutlierDetection.optimizer import HillClimber
+
+    HillClimber(epochs=1).min_solve(
+        EntropyProblem(np.arange(8) % 3, size=4, random_state=0))
+
+
+def solve_column(data, spec):
+    """
+    Solve a single column
+
+    Parameters
+    ----------
+    data : array-like
+        1D column of homogeneous values
+    spec : dict
+        Solver name, solver params, size, search, maximize and
+        random_state, as given in a request
+
+    Returns
+    -------
+    dict
+        Positions removed, final and initial entropy, entropy after each
+        iteration and wall time of the search in seconds
+    """
+
+    from OutlierDetection import optimizer
+    from OutlierDetection.ent import EntropyProblem
+
+    name = spec.get('solver', 'HillClimber')
+    if name not in SOLVERS:
+        raise Exception('Unknown solver {!r}. Choose from {}'.format(
+            name, ', '.join(SOLVERS)))
+
+    data = np.asarray(data)
+    if data.ndim != 1:
+        raise Exception('Column data must be a list of values, got an '
+                        'array of shape {}'.format(data.shape))
+
+    problem = EntropyProblem(data, size=min(spec.get('size', 20), len(data)),
+                             search=spec.get('search', 'window'),
+                             random_state=spec.get('random_state'))
+    solver = getattr(optimizer, name)(**spec.get('params', {}))
+
+    start = time.perf_counter()
+    if spec.get('maximize', False):
+        solution = solver.max_solve(problem)
+    else:
+        solution = solver.min_solve(problem)
+    wall_time = time.perf_counter() - start
+
+    result = solver.result
+
+    return {'removed': result.removed.tolist(),
+            'entropy': float(result.entropy[-1]),
+            'initial_entropy': float(result.entropy[0]),
+            'entropies': result.entropy[1:].tolist(),
+            'wall_time': wall_time}
+
+
+def _solve_batch(tasks):
+    """Solve a micro-batch of (data, spec) tasks in a worker. Errors are
+       returned per task so one bad column does not fail the batch"""
+
+    results = []
+    for data, spec in tasks:
+        try:
+            results.append(solve_column(data, spec))
+        except Exception as error:
+            results.append(_error(error))
+
+    return results
+
+
+class OutlierService:
+    """
+    Solves columns in a warm pool of worker processes, micro-batching small
+    columns together
+
+    Parameters:
+    ----------
+    n_workers : int, optional
+        Number of worker processes. Defaults to the number of CPUs
+
+    max_batch : int
+        Maximum number of columns sent to a worker at once
+
+    max_batch_rows : int
+        Columns are added to a micro-batch until it holds this many rows.
+        Larger columns are sent on their own
+
+    batch_delay : float
+        Seconds to wait for more columns before sending a partial batch
+
+    executor : concurrent.futures.Executor, optional
+        Executor to solve in instead of a new process pool. It is not
+        shut down by close()
+
+    """
+
+    def __init__(self, n_workers=None, max_batch=32, max_batch_rows=100000,
+                 batch_delay=0.002, executor=None):
+        self.n_workers = n_workers or os.cpu_count()
+        self.max_batch = max_batch
+        self.max_batch_rows = max_batch_rows
+        self.batch_delay = batch_delay
+        self.executor = executor
+        self._own_executor = executor is None
+        self._queue = None
+        self._dispatcher = None
+
+
+    async def start(self):
+        """Start the worker pool and wait until every worker is warm"""
+
+        loop = asyncio.get_running_loop()
+
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.n_workers,
+                                                initializer=_warm_up)
+            # a process pool starts its workers lazily, so make each of them
+            # run the initializer now rather than on the first request
+            await asyncio.gather(*(loop.run_in_executor(self.executor,
+                                                        time.sleep, 0.01)
+                                   for _ in range(self.n_workers)))
+
+        self._queue = asyncio.Queue()
+        self._dispatcher = asyncio.ensure_future(self._dispatch())
+
+        return self
+
+
+    async def close(self):
+        """Stop dispatching and shut down the worker pool"""
+
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+
+        if self._own_executor and self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+    async def __aenter__(self):
+        return await self.start()
+
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+    def submit(self, data, spec):
+        """
+        Queue a column to be solved
+
+        Parameters
+        ----------
+        data : array-like
+            1D column
+        spec : dict
+            See solve_column()
+
+        Returns
+        -------
+        asyncio.Future
+            Resolves to the result of solve_column(), or a dict with an
+            error message
+        """
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((data, spec, future))
+
+        return future
+
+
+    async def _dispatch(self):
+        """Collect queued columns into micro-batches and send each batch to
+           the worker pool"""
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+            rows = _rows(batch[0][0])
+            deadline = loop.time() + self.batch_delay
+
+            while len(batch) < self.max_batch and rows < self.max_batch_rows:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(),
+                                                      timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+
+                # a large column is not held back by the small ones
+                if _rows(item[0]) >= self.max_batch_rows:
+                    self._send([item])
+                    continue
+
+                batch.append(item)
+                rows += _rows(item[0])
+
+            self._send(batch)
+
+
+    def _send(self, batch):
+        """Run a micro-batch in the pool and resolve its futures when it
+           finishes"""
+
+        loop = asyncio.get_running_loop()
+
+        # a batch that cannot be sent fails on its own, and the dispatcher
+        # goes on serving later requests
+        try:
+            done = loop.run_in_executor(self.executor, _solve_batch,
+                                        [(data, spec)
+                                         for data, spec, _ in batch])
+        except Exception as error:
+            self._resolve(batch, [_error(error)] * len(batch))
+            return
+
+        def resolve(done):
+            try:
+                results = done.result()
+            except Exception as error:
+                results = [_error(error)] * len(batch)
+
+            self._resolve(batch, results)
+
+        done.add_done_callback(resolve)
+
+
+    @staticmethod
+    def _resolve(batch, results):
+        """Set the result of each future of a micro-batch"""
+
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+    async def handle(self, request, write):
+        """
+        Solve every column of a request and write a response for each
+        column as it finishes, then a final done response
+
+        Parameters
+        ----------
+        request : dict or str
+            Request, or a JSON line holding it
+        write : callable
+            Called with each response dict
+        """
+
+        try:
+            if isinstance(request, (str, bytes)):
+                request = json.loads(request)
+            if not isinstance(request, dict):
+                raise Exception('Request must be a JSON object')
+
+            if 'columns' in request:
+                columns = request['columns']
+                if not isinstance(columns, dict):
+                    raise Exception('"columns" must be an object of column '
+                                    'names to lists of values')
+            elif 'data' in request:
+                columns = {None: request['data']}
+            else:
+                raise Exception('Request has no "columns" or "data"')
+
+            for data in columns.values():
+                if not isinstance(data, list):
+                    raise Exception('Column data must be a list of values')
+        except Exception as error:
+            rid = request.get('id') if isinstance(request, dict) else None
+            write({'id': rid, 'error': 'Invalid request: {}'.format(error)})
+            write({'id': rid, 'done': True})
+            return
+
+        rid = request.get('id')
+        spec = {key: value for key, value in request.items()
+                if key not in ('id', 'columns', 'data')}
+
+        async def solve(column, data):
+            result = await self.submit(data, spec)
+            return column, result
+
+        for finished in asyncio.as_completed([solve(column, data)
+                                              for column, data
+                                              in columns.items()]):
+            column, result = await finished
+            write(dict({'id': rid, 'column': column}, **result))
+
+        write({'id': rid, 'done': True})
+
+
+    async def serve_lines(self, readline, write):
+        """
+        Serve JSON line requests until readline returns an empty line. The
+        requests are handled concurrently, so results of a later request
+        can be written before those of an earlier one
+
+        Parameters
+        ----------
+        readline : coroutine function
+            Returns the next line, or an empty line at the end of input
+        write : callable
+            Called with each response dict
+        """
+
+        pending = set()
+
+        while True:
+            line = await readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+
+            task = asyncio.ensure_future(self.handle(line, write))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        if pending:
+            await asyncio.gather(*pending)
+
+
+    async def serve_stdio(self, stdin=None, stdout=None):
+        """Serve requests read from stdin, writing responses to stdout"""
+
+        stdin = stdin or sys.stdin
+        stdout = stdout or sys.stdout
+        loop = asyncio.get_running_loop()
+
+        async def readline():
+            return await loop.run_in_executor(None, stdin.readline)
+
+        def write(response):
+            stdout.write(json.dumps(response) + '\n')
+            stdout.flush()
+
+        await self.serve_lines(readline, write)
+
+
+    async def serve_unix(self, path):
+        """Serve requests on a Unix socket, one JSON line stream per
+           connection, until cancelled"""
+
+        async def connection(reader, writer):
+            def write(response):
+                writer.write((json.dumps(response) + '\n').encode())
+
+            try:
+                await self.serve_lines(reader.readline, write)
+                await writer.drain()
+            finally:
+                writer.close()
+
+        server = await asyncio.start_unix_server(connection, path=path)
+        async with server:
+            await server.serve_forever()
+
+
+async def _serve(args):
+    async with OutlierService(n_workers=args.workers,
+                              max_batch=args.max_batch,
+                              max_batch_rows=args.max_batch_rows,
+                              batch_delay=args.batch_delay) as service:
+        if args.socket:
+            await service.serve_unix(args.socket)
+        else:
+            await service.serve_stdio()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Serve entropy outlier detection over JSON lines')
+    parser.add_argument('--socket', help='Unix socket path. Reads stdin if '
+                                         'not given')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-batch', type=int, default=32)
+    parser.add_argument('--max-batch-rows', type=int, default=100000)
+    parser.add_argument('--batch-delay', type=float, default=0.002)
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+from OutlierDetection.ent import (CacheInfo, _entropy, _histogram_terms,
+                                  _new_stats, _removal_entropy, _xlogx)
+
+"""Out-of-core outlier detection. The value histogram of a column is built
+   chunk by chunk, the optimizers search over the histogram alone, and the
+   surviving rows are written out in a second streaming pass. Peak memory is
+   bounded by the chunk size plus the number of distinct values"""
+
+
+StreamResult = namedtuple('StreamResult', ['problem', 'solution', 'removed'])
+
+
+class HistogramProblem:
+    """
+    Information entropy problem over a value -> count table rather than
+    the raw data. Candidates are the distinct values that are still
+    present, and removing a candidate removes one occurrence of that value.
+    Exposes the same candidates()/score_removals()/remove() interface as
+    EntropyProblem, so it can be solved with HillClimber or LocalBeamSearch
+
+    Parameters:
+    ----------
+    values : array-like
+        Distinct values of the data
+
+    counts : array-like of int
+        Number of occurrences of each value
+
+    name : str, float, or int
+        Value removed to create this problem from its parent. None for
+        the initial problem
+
+
+    Attributes:
+    ----------
+    base : float
+        Information entropy of the count table. Computed lazily on first
+        access and cached
+
+    """
+
+    def __init__(self, values, counts, name=None):
+        self.values = np.asarray(values)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.name = name
+        self._n, self._n_classes, self._plogp = _histogram_terms(self.counts)
+        self._stats = _new_stats()
+        self._stats['histograms'] = 1
+        self.__base = None
+
+
+    @property
+    def base(self):
+        """Information entropy of the count table in base e"""
+
+        if self.__base is None:
+            self.__base = self.calc_entropy()
+            self._stats['computations'] += 1
+        else:
+            self._stats['hits'] += 1
+
+        return self.__base
+
+
+    def restart(self, random_state=None):
+        """Returns a copy of this problem. The count table has no random
+           initial state, so random_state is accepted for compatibility
+           with EntropyProblem and ignored"""
+
+        problem = HistogramProblem(self.values, self.counts, name=self.name)
+        problem.__base = self.__base
+
+        return problem
+
+
+    def cache_info(self):
+        """Report entropy cache hits and computations, and bytes copied for
+           successor count tables, shared with all successors of this
+           problem"""
+
+        return CacheInfo(**self._stats)
+
+
+    def calc_entropy(self):
+        """Calculate information entropy of the count table in base e"""
+
+        return _entropy(self._n, self._plogp, self._n_classes)
+
+
+    def entropy_terms(self):
+        """Number of observations, sum of c * log(c) and number of distinct
+           values of the count table"""
+
+        return self._n, self._plogp, self._n_classes
+
+
+    def candidates(self):
+        """Returns the index of every value that is still present"""
+
+        return np.flatnonzero(self.counts)
+
+
+    def candidate_counts(self, candidates):
+        """Count of each candidate value, which orders candidates the same
+           way score_removals() does"""
+
+        return self.counts[np.asarray(candidates)]
+
+
+    def candidate_values(self, candidates):
+        """Value removed by each candidate"""
+
+        return self.values[np.asarray(candidates)]
+
+
+    def score_removal(self, candidate):
+        """Entropy resulting from removing one occurrence of a single
+           candidate value, in O(1)"""
+
+        count = int(self.counts[candidate])
+
+        return _entropy(self._n - 1,
+                        self._plogp - _xlogx(count) + _xlogx(count - 1),
+                        self._n_classes - (count == 1))
+
+
+    def score_removals(self, candidates=None):
+        """Vectorized entropy resulting from removing one occurrence of each
+           candidate value"""
+
+        if candidates is None:
+            candidates = self.candidates()
+
+        return _removal_entropy(self.counts[np.asarray(candidates)],
+                                self._n, self._plogp, self._n_classes)
+
+
+    def remove(self, candidate):
+        """Returns the successor with one occurrence of the value at index
+           candidate removed"""
+
+        counts = self.counts.copy()
+        counts[candidate] -= 1
+
+        successor = HistogramProblem(self.values, counts,
+                                     name=self.values[candidate])
+        successor._stats = self._stats
+        successor._stats['bytes_copied'] += counts.nbytes
+
+        return successor
+
+
+    def get_successors(self):
+        """Generator of successors, one per distinct value present"""
+
+        for i in self.candidates():
+            yield self.remove(i)
+
+
+    def removed(self, problem):
+        """
+        Number of occurrences of each value removed relative to an
+        ancestor problem
+
+        Parameters
+        ----------
+        problem : HistogramProblem
+            Ancestor problem, usually the initial problem of the search
+
+        Returns
+        -------
+        pd.Series
+            Number of occurrences removed, indexed by value. Only values
+            with at least one removal are included
+        """
+
+        removed = problem.counts - self.counts
+        mask = removed > 0
+
+        return pd.Series(removed[mask], index=self.values[mask])
+
+
+def _is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+
+def _is_parquet(path):
+    return os.fspath(path).lower().endswith(('.parquet', '.pq'))
+
+
+def iter_chunks(source, chunksize=100000):
+    """
+    Iterate over a data source in chunks
+
+    Parameters
+    ----------
+    source : str, path-like, callable or iterable
+        CSV or Parquet file path, a callable returning a fresh iterable of
+        chunks, or a re-iterable collection of chunks (e.g. a list). Chunks
+        may be arrays, Series or DataFrames. One-shot iterators such as
+        generators are rejected, since the source is read more than once
+    chunksize : int
+        Number of rows per chunk when reading from a file
+
+    Returns
+    -------
+    Generator object of chunks
+    """
+
+    if _is_path(source):
+        if _is_parquet(source):
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError('Reading Parquet files requires pyarrow')
+
+            parquet = pq.ParquetFile(source)
+            for batch in parquet.iter_batches(batch_size=chunksize):
+                yield batch.to_pandas()
+        else:
+            yield from pd.read_csv(source, chunksize=chunksize)
+
+    elif callable(source):
+        yield from source()
+
+    else:
+        # a second pass over a one-shot iterator would silently be empty
+        if iter(source) is source:
+            raise Exception('Source is a one-shot iterator, which cannot be '
+                            'read more than once. Pass a list of chunks, or '
+                            'a callable that returns a new iterator')
+        yield from source
+
+
+def _column(chunk, column=None):
+    """Select the 1D column from a chunk as a Series"""
+
+    if isinstance(chunk, pd.DataFrame):
+        if column is None:
+            if chunk.shape[1] != 1:
+                raise Exception('Chunk has {} columns. Set the column to '
+                                'use'.format(chunk.shape[1]))
+            return chunk.iloc[:, 0]
+        return chunk[column]
+
+    return pd.Series(np.asarray(chunk).ravel())
+
+
+def _binned(values, binner):
+    """Replace each value of a Series by the label of its bin"""
+
+    codes = binner.transform(values.to_numpy(dtype=float, na_value=np.nan))
+
+    return pd.Series(binner.labels[codes], index=values.index)
+
+
+def build_histogram(source, column=None, chunksize=100000, binner=None):
+    """
+    Build the value histogram of a column one chunk at a time
+
+    Parameters
+    ----------
+    source : str, path-like, callable or iterable
+        See iter_chunks()
+    column : str, optional
+        Column to use when chunks are DataFrames with several columns
+    chunksize : int
+        Number of rows per chunk when reading from a file
+    binner : BaseBinner, optional
+        Binner from OutlierDetection.binning used to discretize a continuous
+        column. If it has not been fitted, it is fitted in an extra
+        streaming pass. The histogram then holds bin counts, labelled by
+        the left edge of each bin
+
+    Returns
+    -------
+    HistogramProblem
+        Problem over the value counts of the whole column
+    """
+
+    if binner is not None:
+        if not binner.is_fitted:
+            binner.fit(_column(chunk, column).to_numpy(dtype=float,
+                                                       na_value=np.nan)
+                       for chunk in iter_chunks(source, chunksize=chunksize))
+
+        counts = np.zeros(len(binner.labels), dtype=np.int64)
+        for chunk in iter_chunks(source, chunksize=chunksize):
+            values = _column(chunk, column).to_numpy(dtype=float,
+                                                     na_value=np.nan)
+            counts += np.bincount(binner.transform(values),
+                                  minlength=len(counts))
+
+        return HistogramProblem(binner.labels, counts)
+
+    histogram = pd.Series(dtype=np.int64)
+
+    for chunk in iter_chunks(source, chunksize=chunksize):
+        counts = _column(chunk, column).value_counts(dropna=False)
+        histogram = histogram.add(counts, fill_value=0)
+
+    if len(histogram) == 0:
+        raise Exception('No data found in source')
+
+    return HistogramProblem(histogram.index.to_numpy(),
+                            histogram.to_numpy().astype(np.int64))
+
+
+def filter_chunks(source, removed, column=None, chunksize=100000,
+                  binner=None):
+    """
+    Stream the chunks of a source with outliers dropped. The first n
+    occurrences of each removed value are dropped, where n is the number of
+    times the value was removed during the search
+
+    Parameters
+    ----------
+    source : str, path-like, callable or iterable
+        See iter_chunks()
+    removed : pd.Series
+        Number of occurrences to drop, indexed by value
+    column : str, optional
+        Column to use when chunks are DataFrames with several columns
+    chunksize : int
+        Number of rows per chunk when reading from a file
+    binner : BaseBinner, optional
+        Fitted binner, if removed is indexed by bin label
+
+    Returns
+    -------
+    Generator object of chunks with outliers dropped
+    """
+
+    remaining = removed.copy()
+
+    for chunk in iter_chunks(source, chunksize=chunksize):
+        if not isinstance(chunk, pd.DataFrame):
+            chunk = pd.Series(np.asarray(chunk).ravel())
+
+        values = _column(chunk, column)
+        if binner is not None:
+            values = _binned(values, binner)
+        remaining = remaining[remaining > 0]
+
+        if len(remaining) == 0:
+            yield chunk
+            continue
+
+        positions = np.flatnonzero(values.isin(remaining.index).to_numpy())
+        hits = values.iloc[positions]
+        rank = hits.groupby(hits, dropna=False, sort=False).cumcount()
+        quota = remaining.reindex(hits.to_numpy()).to_numpy()
+        drop = rank.to_numpy() < quota
+
+        dropped = hits.iloc[np.flatnonzero(drop)].value_counts(dropna=False)
+        remaining = remaining.sub(dropped, fill_value=0)
+
+        keep = np.ones(len(values), dtype=bool)
+        keep[positions[drop]] = False
+
+        yield chunk.iloc[keep]
+
+
+def write_chunks(chunks, output):
+    """
+    Write chunks to a CSV or Parquet file, or pass each chunk to a callable
+
+    Parameters
+    ----------
+    chunks : iterable
+        Chunks as Series or DataFrames
+    output : str, path-like or callable
+        File path ending in .csv or .parquet, or a callable that is called
+        with each chunk
+    """
+
+    if callable(output):
+        for chunk in chunks:
+            output(chunk)
+
+    elif _is_parquet(output):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('Writing Parquet files requires pyarrow')
+
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk.to_frame()
+                                             if isinstance(chunk, pd.Series)
+                                             else chunk,
+                                             preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    else:
+        header = True
+        for chunk in chunks:
+            chunk.to_csv(output, mode='w' if header else 'a', header=header,
+                         index=False)
+            header = False
+
+
+def detect_outliers_stream(source, solver, output, column=None,
+                           chunksize=100000, maximize=False, binner=None):
+    """
+    Out-of-core entropy outlier detection. Builds the value histogram of a
+    column in a first streaming pass, runs the solver on the histogram, and
+    writes the surviving rows in a second streaming pass
+
+    Parameters
+    ----------
+    source : str, path-like, callable or iterable
+        See iter_chunks(). It is read twice, three times with an unfitted
+        binner, so one-shot iterators raise an Exception and should be
+        wrapped in a callable that recreates them
+    solver : BaseOptimizer
+        Optimizer such as HillClimber or LocalBeamSearch
+    output : str, path-like or callable
+        See write_chunks()
+    column : str, optional
+        Column to use when chunks are DataFrames with several columns
+    chunksize : int
+        Number of rows per chunk when reading from a file
+    maximize : bool
+        Use the solver's max_solve instead of min_solve
+    binner : BaseBinner, optional
+        Binner used to discretize a continuous column. See
+        build_histogram()
+
+    Returns
+    -------
+    StreamResult
+        Named tuple of the initial problem, the solved problem and the
+        number of occurrences removed per value
+    """
+
+    problem = build_histogram(source, column=column, chunksize=chunksize,
+                              binner=binner)
+
+    if maximize:
+        solution = solver.max_solve(problem)
+    else:
+        solution = solver.min_solve(problem)
+
+    removed = solution.removed(problem)
+
+    write_chunks(filter_chunks(source, removed, column=column,
+                               chunksize=chunksize, binner=binner),
+                 output)
+
+    return StreamResult(problem, solution, removed)
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from OutlierDetection.binning import FixedWidthBinner, QuantileBinner
+from OutlierDetection.ent import EntropyProblem
+from OutlierDetection.optimizer import HillClimber, LocalBeamSearch
+
+
+def _binned_entropy(values, binner):
+    _, counts = np.unique(binner.transform(values), return_counts=True)
+    p = counts / counts.sum()
+    return float(-(p * np.log(p)).sum())
+
+
+def test_transform_single_value():
+    binner = FixedWidthBinner(4, value_range=(0., 1.))
+
+    assert binner.transform(0.6) == 2
+    assert binner.transform(np.nan) == 4
+    assert binner.transform([0.1, np.nan, 2.]).tolist() == [0, 4, 3]
+
+
+@pytest.mark.parametrize('wrap', [np.asarray, pd.Series])
+@pytest.mark.parametrize('binner', [FixedWidthBinner, QuantileBinner])
+@pytest.mark.parametrize('solver', [HillClimber, LocalBeamSearch])
+def test_optimizer_on_binned_column_in_window_search(wrap, binner, solver):
+    data = np.random.default_rng(0).normal(size=500)
+    data[::50] = np.nan
+
+    problem = EntropyProblem(wrap(data), size=20, search='window',
+                             binner=binner(16), random_state=0)
+    optimizer = solver(epochs=10, random_state=0)
+    solution = optimizer.min_solve(problem)
+
+    assert len(optimizer.result) > 0
+    assert len(solution.removed) == len(optimizer.result)
+    assert solution.base == pytest.approx(
+        _binned_entropy(np.delete(data, solution.removed), problem.binner))
+
+
+def test_base_binner_is_abstract():
+    from OutlierDetection.binning import BaseBinner
+
+    with pytest.raises(TypeError):
+        BaseBinner()
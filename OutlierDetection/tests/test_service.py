@@ -0,0 +1,79 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from OutlierDetection.service import OutlierService
+
+
+class _RecordingExecutor(ThreadPoolExecutor):
+    """Thread pool that records the columns of each micro-batch"""
+
+    def __init__(self):
+        super().__init__(2)
+        self.batches = []
+
+    def submit(self, fn, tasks, *args, **kwargs):
+        self.batches.append([len(data) for data, _ in tasks])
+        return super().submit(fn, tasks, *args, **kwargs)
+
+
+def _serve(lines, **params):
+    executor = _RecordingExecutor()
+    responses = []
+
+    async def run():
+        queue = iter(lines + [''])
+
+        async def readline():
+            return next(queue)
+
+        async with OutlierService(executor=executor, **params) as service:
+            await service.serve_lines(readline, responses.append)
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown()
+
+    return responses, executor.batches
+
+
+def test_serve_lines():
+    rng = np.random.default_rng(0)
+    request = {'id': 1, 'size': 5, 'random_state': 0,
+               'params': {'epochs': 3},
+               'columns': {name: rng.integers(0, 4, 40).tolist()
+                           for name in 'abc'}}
+    lines = [json.dumps(request), '\n', 'not json\n',
+             json.dumps({'id': 2, 'data': 'x'})]
+
+    responses, batches = _serve(lines, batch_delay=0.05)
+
+    columns = {r['column']: r for r in responses if 'column' in r}
+    assert sorted(columns) == ['a', 'b', 'c']
+    for result in columns.values():
+        assert result['id'] == 1
+        assert len(result['removed']) == 3
+        assert result['entropy'] <= result['initial_entropy']
+    assert {'id': 1, 'done': True} in responses
+    assert {'id': None, 'done': True} in responses
+    assert {'id': 2, 'done': True} in responses
+    assert sum(1 for r in responses if 'error' in r) == 2
+    # the three small columns of a request go to a worker together
+    assert batches == [[40, 40, 40]]
+
+
+def test_large_column_is_sent_on_its_own():
+    request = {'id': 1, 'size': 5, 'random_state': 0,
+               'params': {'epochs': 1},
+               'columns': {'a': list(range(10)) * 2,
+                           'big': list(range(10)) * 20,
+                           'b': list(range(10)) * 2}}
+
+    responses, batches = _serve([json.dumps(request)], max_batch_rows=100,
+                                batch_delay=0.05)
+
+    assert sum(1 for r in responses if 'column' in r and 'error' not in r) == 3
+    assert sorted(batches) == [[20, 20], [200]]
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from OutlierDetection.binning import FixedWidthBinner
+from OutlierDetection.optimizer import HillClimber
+from OutlierDetection.stream import detect_outliers_stream
+
+
+def _chunks():
+    return [pd.Series([1, 1, 1, 2]), pd.Series([1, 1, 3, 1]),
+            pd.Series([1, 2, 1, 1])]
+
+
+@pytest.mark.parametrize('binner', [None, FixedWidthBinner])
+def test_generator_source_is_rejected(binner):
+    written = []
+
+    with pytest.raises(Exception, match='one-shot iterator'):
+        detect_outliers_stream((chunk for chunk in _chunks()),
+                               HillClimber(epochs=5), written.append,
+                               binner=binner and binner(4))
+
+    assert written == []
+
+
+@pytest.mark.parametrize('binner', [None, FixedWidthBinner])
+@pytest.mark.parametrize('source', [_chunks, _chunks()],
+                         ids=['callable', 'list'])
+def test_reiterable_source(source, binner):
+    written = []
+
+    result = detect_outliers_stream(source, HillClimber(epochs=5),
+                                    written.append,
+                                    binner=binner and binner(4))
+
+    assert result.removed.sum() > 0
+    assert sum(len(chunk) for chunk in written) == 12 - result.removed.sum()